@@ -0,0 +1,243 @@
+import json
+import math
+import os
+import sys
+from typing import Dict, Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated statistics of the cleaned data in a few rollups, each keyed by
+# the route and one more dimension (month, ISO year and week, weekday or stops). Every
+# cell keeps count, sum, min, max and a quantile sketch for each measure. Those
+# all merge, so any grouping of a rollup's columns (per route, per country, per
+# month...) is answered from its cells without touching the rows again. The full
+# cross product of the dimensions is not kept: it has about one cell per row.
+CUBE_FILE = "clean_cube.csv"
+DIMENSIONS = ["From", "To", "Month", "ISO_Year", "Week", "Day_of_Week", "Stops"]
+ROLLUPS = {  # in the order query() prefers them, usually the fewest cells first
+    "route_month": ["From", "To", "Month"],
+    "route_stops": ["From", "To", "Stops"],
+    "route_weekday": ["From", "To", "Day_of_Week"],
+    "route_week": ["From", "To", "ISO_Year", "Week"],  # week N of different years (or Dec/Jan) stays apart
+}
+INT_DIMENSIONS = ["ISO_Year", "Week", "Stops"]
+MEASURES = ["Price", "Flight Duration", "co2 emissions"]
+UNKNOWN_STOPS = -1  # cell value for rows whose Stops could not be parsed or imputed
+
+# Log-bucket sketch: bucket i holds values in (GAMMA^(i-1), GAMMA^i], so a quantile
+# read back from a bucket is within SKETCH_ACCURACY (relative) of a real value
+SKETCH_ACCURACY = 0.01
+GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+ZERO_BUCKET = -(2 ** 31)  # values <= 0
+
+
+def cell_keys(df) -> pd.DataFrame:
+    # Every dimension for each row of a cleaned frame (needs From, To, Date, Stops)
+    dates = pd.to_datetime(df["Date"])
+    iso = dates.dt.isocalendar()
+    return pd.DataFrame({
+        "From": df["From"].astype(str),
+        "To": df["To"].astype(str),
+        "Month": dates.dt.strftime("%Y-%m"),
+        "ISO_Year": iso.year.astype("int64"),
+        "Week": iso.week.astype("int64"),
+        "Day_of_Week": dates.dt.day_name(),
+        "Stops": df["Stops"].astype("Int64").fillna(UNKNOWN_STOPS).astype("int64"),
+    }, index=df.index)
+
+
+def _buckets(values: pd.Series) -> pd.Series:
+    values = values.astype("float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        buckets = np.ceil(np.log(values) / LOG_GAMMA)
+    buckets[values <= 0] = ZERO_BUCKET
+    return buckets
+
+
+def _sketch_strings(frame: pd.DataFrame, dims: List[str], measure: str, cells: pd.MultiIndex) -> List[str]:
+    # {"bucket": count} JSON per cell, in the order of `cells`
+    values = frame[dims + [measure]].dropna(subset=[measure])
+    counts = values.assign(_bucket=_buckets(values[measure]).astype("int64")) \
+        .groupby(dims + ["_bucket"]).size()
+    sketches: Dict[tuple, Dict[str, int]] = {}
+    for key, count in counts.items():
+        sketches.setdefault(key[:-1], {})[str(key[-1])] = int(count)
+    return [json.dumps(sketches.get(cell if isinstance(cell, tuple) else (cell,), {}), separators=(",", ":"))
+            for cell in cells]
+
+
+def _build_rollup(name: str, keys: pd.DataFrame, df) -> pd.DataFrame:
+    dims = ROLLUPS[name]
+    frame = keys[dims].copy()
+    for m in MEASURES:
+        frame[m] = df[m].astype("float64")
+    grouped = frame.groupby(dims, sort=True)
+    cells = grouped.size().rename("rows").to_frame()
+    for m in MEASURES:
+        cells[f"{m} count"] = grouped[m].count()
+        cells[f"{m} sum"] = grouped[m].sum()
+        cells[f"{m} min"] = grouped[m].min()
+        cells[f"{m} max"] = grouped[m].max()
+        cells[f"{m} sketch"] = _sketch_strings(frame, dims, m, cells.index)
+    cells = cells.reset_index()
+    cells.insert(0, "Rollup", name)
+    return cells
+
+
+def _columns() -> List[str]:
+    stats = [f"{m} {s}" for m in MEASURES for s in ("count", "sum", "min", "max", "sketch")]
+    return ["Rollup"] + DIMENSIONS + ["rows"] + stats
+
+
+def build_cube(df) -> pd.DataFrame:
+    # Every rollup stacked in one frame; a rollup's unused dimension columns are empty
+    keys = cell_keys(df)
+    return pd.concat([_build_rollup(name, keys, df) for name in ROLLUPS], ignore_index=True) \
+        .reindex(columns=_columns())
+
+
+def rollup_cells(cube: pd.DataFrame, name: str) -> pd.DataFrame:
+    # One rollup's cells, without the other rollups' dimension columns
+    dims = ROLLUPS[name]
+    unused = [d for d in DIMENSIONS if d not in dims]
+    cells = cube[cube["Rollup"] == name].drop(columns=unused)
+    return cells.astype({d: "int64" for d in INT_DIMENSIONS if d in dims})
+
+
+def update_cube(cube: pd.DataFrame, df, touched) -> pd.DataFrame:
+    # Recomputes only the cells that `touched` rows (added, changed or removed;
+    # any frame with From, To, Date, Stops) belong to, from the full cleaned frame df.
+    # Min/max cannot be un-merged, so touched cells are rebuilt rather than patched.
+    keys, touched_keys = cell_keys(df), cell_keys(touched)
+    parts = []
+    for name, dims in ROLLUPS.items():
+        cells = rollup_cells(cube, name)
+        touched_cells = pd.MultiIndex.from_frame(touched_keys[dims]).unique()
+        if not touched_cells.empty:
+            in_touched = pd.MultiIndex.from_frame(keys[dims]).isin(touched_cells)
+            fresh = _build_rollup(name, keys[in_touched], df[in_touched])
+            kept = cells[~pd.MultiIndex.from_frame(cells[dims]).isin(touched_cells)]
+            cells = pd.concat([kept, fresh], ignore_index=True).sort_values(dims)
+        parts.append(cells)
+    return pd.concat(parts, ignore_index=True).reindex(columns=_columns())
+
+
+def save_cube(cube: pd.DataFrame, path: str = CUBE_FILE):
+    tmp_path = path + ".tmp"
+    cube.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_cube(path: str = CUBE_FILE, source: str = "clean.csv") -> pd.DataFrame:
+    if os.path.exists(path):
+        cube = pd.read_csv(path, dtype={"Rollup": str, "From": str, "To": str, "Month": str, "Day_of_Week": str})
+        if set(_columns()) <= set(cube.columns):
+            return cube
+        print(f"{path} is in an older format, rebuilding it from {source}")
+    else:
+        print(f"{path} not found, building the cube from {source}")
+    return build_cube(pd.read_csv(source))
+
+
+def merge_sketches(sketches: Iterable[str]) -> Dict[int, int]:
+    merged: Dict[int, int] = {}
+    for sketch in sketches:
+        for bucket, count in json.loads(sketch).items():
+            merged[int(bucket)] = merged.get(int(bucket), 0) + count
+    return merged
+
+
+def sketch_quantile(sketch: Dict[int, int], q: float) -> float:
+    total = sum(sketch.values())
+    if total == 0:
+        return np.nan
+    rank = q * (total - 1)
+    seen = 0
+    for bucket in sorted(sketch):
+        seen += sketch[bucket]
+        if seen > rank:
+            return 0.0 if bucket == ZERO_BUCKET else 2 * GAMMA ** bucket / (GAMMA + 1)
+    return np.nan
+
+
+def pick_rollup(columns: Iterable[str]) -> str:
+    # The first rollup that has every dimension in `columns` (any of them gives the
+    # same answer); other columns, such as a Country mapping added to the cube, are in all of them
+    needed = {c for c in columns if c in DIMENSIONS}
+    for name, dims in ROLLUPS.items():
+        if needed <= set(dims):
+            return name
+    raise ValueError(f"No rollup has all of {sorted(needed)}; rollups: "
+                     + ", ".join(f"{name} ({', '.join(dims)})" for name, dims in ROLLUPS.items()))
+
+
+def query(cube: pd.DataFrame, by: Union[str, List[str]], where: Dict = None,
+          measures: Union[str, List[str]] = MEASURES,
+          stats: Iterable[str] = ("count", "mean", "min", "max")) -> pd.DataFrame:
+    # Groups the cells of the smallest rollup that has the `by` and `where`
+    # columns, after filtering with where={column: value or list of values}.
+    # stats: count, sum, mean, min, max and pNN percentiles (e.g. p50, p90, from
+    # the sketches). One measure name gives flat stat columns, like
+    # df.groupby(by)[measure].agg(stats); a list gives (measure, stat) columns.
+    where = where or {}
+    keys = [by] if isinstance(by, str) else list(by)
+    single = isinstance(measures, str)
+    measures = [measures] if single else list(measures)
+    stats = list(stats)
+    for stat in stats:
+        if stat not in ("count", "sum", "mean", "min", "max") and not stat.startswith("p"):
+            raise ValueError(f"Unknown statistic: {stat}")
+    quantiles = [stat for stat in stats if stat.startswith("p")]
+
+    # Only the cells of one rollup and the columns this query reads; the rollup's
+    # integer dimensions come back from the CSV as floats (other rollups leave them empty)
+    extremes = quantiles or "min" in stats or "max" in stats
+    wanted = [f"{m} {s}" for m in measures for s in (("count", "sum", "min", "max") if extremes else ("count", "sum"))]
+    wanted += [f"{m} sketch" for m in measures] if quantiles else []
+    mask = cube["Rollup"].to_numpy() == pick_rollup(keys + list(where))
+    for col, value in where.items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        mask &= cube[col].isin(values).to_numpy()
+    cells = cube.loc[mask, list(dict.fromkeys(keys + wanted))]
+    int_keys = [k for k in keys if k in INT_DIMENSIONS]
+    if int_keys:
+        cells = cells.astype({k: "int64" for k in int_keys})
+    grouped = cells.groupby(by, sort=True)
+    totals = grouped[[f"{m} {s}" for m in measures for s in ("count", "sum")]].sum()
+    counts, sums = totals.to_numpy()[:, 0::2], totals.to_numpy()[:, 1::2]
+    if extremes:
+        mins = grouped[[f"{m} min" for m in measures]].min().to_numpy()
+        maxs = grouped[[f"{m} max" for m in measures]].max().to_numpy()
+
+    result = {}
+    for i, m in enumerate(measures):
+        for stat in stats:
+            if stat == "count":
+                column = counts[:, i].astype("int64")
+            elif stat == "sum":
+                column = sums[:, i]
+            elif stat == "mean":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    column = np.where(counts[:, i] > 0, sums[:, i] / counts[:, i], np.nan)
+            elif stat == "min":
+                column = mins[:, i]
+            elif stat == "max":
+                column = maxs[:, i]
+            else:
+                q = float(stat[1:]) / 100
+                column = grouped[f"{m} sketch"].agg(lambda s: sketch_quantile(merge_sketches(s), q)).to_numpy()
+                # A bucket midpoint can fall just outside the real range
+                column = np.clip(column, mins[:, i], maxs[:, i])
+            result[stat if single else (m, stat)] = column
+    return pd.DataFrame(result, index=totals.index)
+
+
+if __name__ == "__main__":
+    # python aggregates.py [clean.csv]: rebuild the cube from a cleaned CSV
+    source = sys.argv[1] if len(sys.argv) > 1 else "clean.csv"
+    cube = build_cube(pd.read_csv(source))
+    save_cube(cube)
+    print(f"Wrote {len(cube)} cells to {CUBE_FILE} "
+          f"({', '.join(f'{name}: {n}' for name, n in cube['Rollup'].value_counts().sort_index().items())})")
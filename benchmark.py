@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import contextlib
+import functools
+import http.server
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+import psutil
+
+import scraper
+from request_blocking import ResourceBlocker
+from scraper import COUNTRIES, TAIWAN, build_jobs, generate_daily_dates, get_best_price, launch_browser, process_month
+
+# Offline benchmarks; every command prints one JSON document (or writes it to --output).
+#   record: save live result pages (scripts stripped) into PAGES_DIR, once
+#   scrape: serve PAGES_DIR locally and time get_best_price and process_month on it
+#   clean:  time reading_raw_data, clean_data and check_missing_dates on synthetic raw CSVs
+PAGES_DIR = "bench_pages"
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+MAX_SYNTHETIC_DAYS = 20 * 365  # bigger files repeat keys, like re-runs do in the real CSV
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else None
+
+
+def browser_rss() -> int:
+    # Resident memory of every process started by this one (the browsers), in bytes
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        with contextlib.suppress(psutil.Error):
+            total += child.memory_info().rss
+    return total
+
+
+class RssSampler:
+    # Peak browser RSS, sampled in the background while a benchmark runs
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak = 0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, browser_rss())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, browser_rss())
+
+
+# --- record ----------------------------------------------------------------
+
+async def record_pages(count: int, pages_dir: str = PAGES_DIR):
+    os.makedirs(pages_dir, exist_ok=True)
+    all_jobs = build_jobs(generate_daily_dates(datetime.now().year, 6, datetime.now().year, 8))
+    jobs = all_jobs[::max(1, len(all_jobs) // count)][:count]  # spread over routes and dates
+    p, browser, page = await launch_browser(ResourceBlocker())
+    saved = 0
+    try:
+        for from_airport, to_airport, date in jobs:
+            url = scraper.FlightURLBuilder.build_url(from_airport, to_airport, date)
+            try:
+                await page.goto(url, timeout=60000)
+                await scraper.wait_for_results(page)
+            except Exception as e:
+                print(f"Skipping {from_airport}->{to_airport} {date}: {e}", file=sys.stderr)
+                continue
+            # Without scripts the snapshot renders the same cards and never calls out
+            html = re.sub(r"<script\b[^>]*>.*?</script>", "", await page.content(), flags=re.S | re.I)
+            with open(os.path.join(pages_dir, f"{from_airport}-{to_airport}-{date}.html"), "w",
+                      encoding="utf-8") as f:
+                f.write(html)
+            saved += 1
+    finally:
+        await browser.close()
+        await p.stop()
+    return {"pages_dir": pages_dir, "saved": saved}
+
+
+# --- scrape ----------------------------------------------------------------
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_pages(pages_dir: str):
+    handler = functools.partial(QuietHandler, directory=os.path.abspath(pages_dir))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class LocalURLBuilder:
+    # Stands in for FlightURLBuilder: every search maps to one of the recorded pages
+    base_url = ""
+    pages: List[str] = []
+
+    @classmethod
+    def build_url(cls, from_airport: str, to_airport: str, date: str) -> str:
+        key = f"{from_airport}-{to_airport}-{date}"
+        if f"{key}.html" in cls.pages:
+            return f"{cls.base_url}/{key}.html"
+        return f"{cls.base_url}/{cls.pages[zlib.crc32(key.encode()) % len(cls.pages)]}"
+
+
+async def bench_get_best_price(jobs) -> Dict:
+    latencies = []
+    found = 0
+    blocker = ResourceBlocker()  # the scraper's blocking policy, so the timings match a real run
+    p, browser, page = await launch_browser(blocker)
+    try:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            for from_airport, to_airport, date in jobs:
+                url = LocalURLBuilder.build_url(from_airport, to_airport, date)
+                t = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    best = await get_best_price(page, url)
+                latencies.append(time.perf_counter() - t)
+                found += best is not None
+            elapsed = time.perf_counter() - started
+    finally:
+        await browser.close()
+        await p.stop()
+    return {
+        "searches": len(jobs),
+        "found": found,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(len(jobs) / elapsed, 3) if elapsed else None,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "browser_rss_peak_mb": round(rss.peak / 2 ** 20, 1),
+        "requests_blocked": sum(blocker.blocked.values()),
+    }
+
+
+async def bench_process_month(dates) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="bench_month_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # keeps the CSV and SQLite output away from the real files
+    try:
+        with RssSampler() as rss:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                stats = await process_month(dates, "benchmark", "bench_month.csv")
+            elapsed = time.perf_counter() - started
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    pages = sum(s["pages"] for s in stats.values())
+    return {
+        "searches": len(build_jobs(dates)),
+        "pages": pages,
+        "found": sum(s["found"] for s in stats.values()),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else None,
+        "browser_rss_peak_mb": round(rss.peak / 2 ** 20, 1),
+    }
+
+
+async def run_scrape(pages_dir: str, searches: int, month_days: int) -> Dict:
+    names = os.listdir(pages_dir) if os.path.isdir(pages_dir) else []
+    LocalURLBuilder.pages = sorted(name for name in names if name.endswith(".html"))
+    if not LocalURLBuilder.pages:
+        raise SystemExit(f"No recorded pages in {pages_dir}; run 'python benchmark.py record' first")
+    with serve_pages(pages_dir) as base_url:
+        LocalURLBuilder.base_url = base_url
+        scraper.FlightURLBuilder = LocalURLBuilder
+        dates = generate_daily_dates(datetime.now().year, 6, datetime.now().year, 6)[:month_days]
+        jobs = build_jobs(dates)[:searches]
+        return {
+            "recorded_pages": len(LocalURLBuilder.pages),
+            "extract_mode": scraper.EXTRACT_MODE,
+            "get_best_price": await bench_get_best_price(jobs),
+            "process_month": await bench_process_month(dates),
+        }
+
+
+# --- clean -----------------------------------------------------------------
+
+AIRLINES = np.array(["EVA Air", "China Airlines", "STARLUX Airlines", "Cathay Pacific", "Tigerair Taiwan",
+                     "Japan Airlines", "Korean Air", "Thai Airways", "Lufthansa", "Emirates"])
+CLOCK_TIMES = np.array([f"{h}:{m:02d} {ap}" for ap in ("AM", "PM") for h in range(1, 13) for m in (5, 30, 50)])
+EMISSION_VARIATIONS = np.array(["-12% emissions", "+5% emissions", "Avg emissions", "+21% emissions", "-3% emissions"])
+
+
+def synthetic_chunk(start: int, rows: int, days: int, rng) -> pd.DataFrame:
+    # Rows start..start+rows of a synthetic best_flight_prices.csv in the scraper's raw format
+    routes = [(airport, TAIWAN) for _, airport in COUNTRIES] + [(TAIWAN, airport) for _, airport in COUNTRIES]
+    k = np.arange(start, start + rows)
+    route_idx = k % len(routes)
+    dates = pd.Series(np.datetime64("2025-06-01") + (k // len(routes)) % days).dt.strftime("%Y-%m-%d")
+    stops = rng.choice([0, 1, 2, 3], rows, p=[0.5, 0.38, 0.1, 0.02])
+    minutes = pd.Series(rng.integers(60, 1800, rows))
+    hours, mins = (minutes // 60).astype(str), minutes % 60
+    duration = (hours + " hr " + mins.astype(str) + " min").where(mins != 0, hours + " hr")
+    price = pd.Series(rng.integers(2000, 60000, rows)).map("NT${:,}".format)
+    co2 = pd.Series(rng.integers(60, 2400, rows)).map("{:,} kg CO2e".format)
+    return pd.DataFrame({
+        "From": [routes[i][0] for i in route_idx],
+        "To": [routes[i][1] for i in route_idx],
+        "Date": dates,
+        "Departure Time": rng.choice(CLOCK_TIMES, rows),
+        "Arrival Time": pd.Series(rng.choice(CLOCK_TIMES, rows)) + np.where(rng.random(rows) < 0.2, "+1", ""),
+        "Airline Company": rng.choice(AIRLINES, rows),
+        "Flight Duration": duration,
+        "Stops": np.where(stops == 0, "Nonstop", np.where(stops == 1, "1 stop", stops.astype(str) + " stops")),
+        "Price": price,
+        "co2 emissions": co2,
+        "emissions variation": rng.choice(EMISSION_VARIATIONS, rows),
+    })
+
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 0, chunk_rows: int = 1_000_000):
+    rng = np.random.default_rng(seed)
+    routes = 2 * len(COUNTRIES)
+    days = min(max(1, -(-rows // routes)), MAX_SYNTHETIC_DAYS)
+    for start in range(0, rows, chunk_rows):
+        chunk = synthetic_chunk(start, min(chunk_rows, rows - start), days, rng)
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False, encoding="utf-8")
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args)
+    return result, round(time.perf_counter() - started, 3)
+
+
+def bench_clean(rows: int) -> Dict:
+    import data_clean
+    from check_date import check_missing_dates
+
+    workdir = tempfile.mkdtemp(prefix="bench_clean_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # data_clean reads and writes fixed file names in the working directory
+    try:
+        started = time.perf_counter()
+        write_synthetic_csv(data_clean.CSV_FILE, rows)
+        result = {"rows": rows, "csv_mb": round(os.path.getsize(data_clean.CSV_FILE) / 2 ** 20, 1),
+                  "generate_s": round(time.perf_counter() - started, 3)}
+        _, result["check_missing_dates_cold_s"] = timed(check_missing_dates, data_clean.CSV_FILE, 2025, 6, 2025, 8)
+        _, result["check_missing_dates_warm_s"] = timed(check_missing_dates, data_clean.CSV_FILE, 2025, 6, 2025, 8)
+        df_raw, result["reading_raw_data_s"] = timed(data_clean.reading_raw_data)
+        df_clean, result["clean_data_s"] = timed(data_clean.clean_data, df_raw)
+        result["clean_rows"] = 0 if df_clean is None else len(df_clean)
+        result["rss_mb"] = round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    finally:
+        os.chdir(cwd)
+        # The synthetic CSV and everything cleaned from it run to gigabytes at the larger sizes
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scrape and clean benchmarks (JSON output)")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="save live result pages for the scrape benchmark")
+    record.add_argument("--pages", type=int, default=20)
+    scrape = commands.add_parser("scrape", help="time get_best_price and process_month on recorded pages")
+    scrape.add_argument("--searches", type=int, default=50, help="get_best_price calls")
+    scrape.add_argument("--month-days", type=int, default=5, help="days of June for process_month")
+    clean = commands.add_parser("clean", help="time the cleaning stages on synthetic CSVs")
+    clean.add_argument("--rows", default=",".join(map(str, DEFAULT_ROWS)),
+                       help="comma-separated sizes, e.g. 10000,100000,1000000,10000000")
+    for command in (record, scrape):
+        command.add_argument("--pages-dir", default=PAGES_DIR)
+    args = parser.parse_args(argv)
+
+    report = {
+        "benchmark": args.command,
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "cpus": os.cpu_count(),
+    }
+    if args.command == "record":
+        report.update(asyncio.run(record_pages(args.pages, args.pages_dir)))
+    elif args.command == "scrape":
+        report.update(asyncio.run(run_scrape(args.pages_dir, args.searches, args.month_days)))
+    else:
+        report["results"] = [bench_clean(int(rows)) for rows in args.rows.split(",")]
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-import csv
+import os
 from datetime import datetime, timedelta
 
+from coverage_index import CoverageIndex, coverage_for, month_range
+
 COUNTRIES = [
  ("JPN", "NRT"),  # Japan - Tokyo Narita
     ("KOR", "ICN"),  # South Korea - Incheon
@@ -30,35 +32,23 @@ def generate_daily_dates(start_year: int, start_month: int, end_year: int, end_m
         current += timedelta(days=1)
     return dates
 
-def check_missing_dates(csv_file: str, start_year: int, start_month: int, end_year: int, end_month: int):
-    # Generate all expected dates
-    expected_dates = generate_daily_dates(start_year, start_month, end_year, end_month)
-    # Create a set of all expected (country, date) pairs for both directions
-    expected_pairs = set()
+def expected_routes() -> list:
+    # Every (from, to) route that should have data, both directions
+    routes = []
     for country_code, airport in COUNTRIES:
-        for direction in [(airport, TAIWAN), (TAIWAN, airport)]:
-            for date in expected_dates:
-                expected_pairs.add((direction[0], direction[1], date))
+        routes += [(airport, TAIWAN), (TAIWAN, airport)]
+    return routes
 
-    # Read existing data from CSV
-    existing_pairs = set()
-    try:
-        with open(csv_file, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                from_airport = row.get("From")
-                to_airport = row.get("To")
-                date = row.get("Date")
-                if from_airport and to_airport and date:
-                    existing_pairs.add((from_airport, to_airport, date))
-    except FileNotFoundError:
+def check_missing_dates(csv_file: str, start_year: int, start_month: int, end_year: int, end_month: int):
+    if not os.path.exists(csv_file):
         print(f"CSV file {csv_file} not found.")
         return None
 
-    # Find missing pairs
-    missing = expected_pairs - existing_pairs
-    missing_sorted = sorted(missing, key=lambda x: (x[0], x[1], x[2]))
-    return missing_sorted
+    # Bitmap of route-days with data, kept in coverage.idx and only updated
+    # with the rows appended to the CSV since the last check
+    first_day, last_day = month_range(start_year, start_month, end_year, end_month)
+    index = coverage_for(csv_file, expected_routes(), first_day, last_day)
+    return list(index.missing())
 
 if __name__ == "__main__":
     csv_file = "best_flight_prices.csv"
@@ -77,3 +67,7 @@ if __name__ == "__main__":
         print("Missing dates and routes:")
         for from_airport, to_airport, date in missing_dates:
             print(f"From {from_airport} to {to_airport} on {date}")
+        coverage = CoverageIndex.load().coverage()
+        print("Routes with gaps (percentage of days with data):")
+        for (from_airport, to_airport), percent in coverage[coverage < 100].sort_values().items():
+            print(f"{from_airport} -> {to_airport}: {percent:.1f}%")
@@ -0,0 +1,76 @@
+import os
+from typing import Dict, Iterable, List, Tuple
+
+JOURNAL_FILE = "scrape_journal.log"
+
+# Journal line statuses; "done" and "empty" are finished, "failed" is retried next run
+DONE = "done"
+EMPTY = "empty"
+FAILED = "failed"
+FINISHED = {DONE, EMPTY}
+
+
+class Journal:
+    # Append-only log of job outcomes, one "status<TAB>from<TAB>to<TAB>date" line per event.
+    # Jobs that were in flight when a run died have no line, so the next run queues them again.
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.status: Dict[Tuple[str, str, str], str] = {}
+        self.lines = 0
+        self._load()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        line = "\n"
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4:
+                        continue  # torn last line from a crash
+                    status, from_airport, to_airport, date = parts
+                    self.status[(from_airport, to_airport, date)] = status
+                    self.lines += 1
+        except FileNotFoundError:
+            return
+        if not line.endswith("\n"):
+            # Terminate a torn last line so the next record starts on its own line
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    def is_finished(self, job) -> bool:
+        return self.status.get(tuple(job)) in FINISHED
+
+    def pending(self, jobs: Iterable[Tuple[str, str, str]]) -> List[Tuple[str, str, str]]:
+        return [job for job in jobs if not self.is_finished(job)]
+
+    def record(self, status: str, jobs: Iterable[Tuple[str, str, str]]):
+        for job in jobs:
+            self.status[tuple(job)] = status
+            self.file.write(f"{status}\t{job[0]}\t{job[1]}\t{job[2]}\n")
+            self.lines += 1
+        self.file.flush()
+
+    def write_batch(self, rows: List[Dict]):
+        # Used as the last ResultWriter sink, so a job is only marked done after its row is written
+        self.record(DONE, [(row["From"], row["To"], row["Date"]) for row in rows])
+
+    def compact(self):
+        # Rewrite the journal with one line per job, atomically
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (from_airport, to_airport, date), status in self.status.items():
+                f.write(f"{status}\t{from_airport}\t{to_airport}\t{date}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.lines = len(self.status)
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if self.lines > 2 * len(self.status):
+            self.compact()
+        self.file.close()
@@ -0,0 +1,173 @@
+import os
+import shutil
+from datetime import date
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Typed copy of clean.csv for analysis: a Parquet dataset partitioned as
+# Month=YYYY-MM/Route=FROM-TO/, with From/To/Day_of_Week stored as dictionary
+# (categorical) columns and each integer column in the smallest type that fits.
+# load_clean() returns the value columns (price, duration, co2) as Int64 so sums
+# and differences of them cannot overflow; only Stops and Week stay narrow.
+# pyarrow is imported only inside the functions so data_clean.py still runs without it.
+PARQUET_DIR = "clean_parquet"
+CSV_FALLBACK = "clean.csv"
+PARTITION_COLUMNS = ["Month", "Route"]
+INT_COLUMNS = ["Stops", "Flight Duration", "Price", "co2 emissions", "Week"]
+VALUE_COLUMNS = ["Flight Duration", "Price", "co2 emissions"]  # widened to Int64 on load
+CATEGORY_COLUMNS = ["From", "To", "Day_of_Week"]
+
+
+def add_derived_columns(df):
+    # The columns the visualization notebook used to rebuild after every load
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["Route"] = df["From"].astype(str) + "-" + df["To"].astype(str)
+    df["Month"] = df["Date"].dt.strftime("%Y-%m")
+    df["Day_of_Week"] = df["Date"].dt.day_name()
+    df["Week"] = df["Date"].dt.isocalendar().week.astype("Int64")
+    return df
+
+
+def _smallest_int_type(series):
+    import pyarrow as pa
+
+    values = series.dropna()
+    if values.empty:
+        return pa.int8()
+    for arrow_type, numpy_type in ((pa.int8(), np.int8), (pa.int16(), np.int16), (pa.int32(), np.int32)):
+        info = np.iinfo(numpy_type)
+        if values.min() >= info.min and values.max() <= info.max:
+            return arrow_type
+    return pa.int64()
+
+
+def _schema(df):
+    import pyarrow as pa
+
+    fields = []
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS:
+            # Index width from the number of categories (hundreds of airports do not fit in int8)
+            categories = df[col].astype("category").cat.categories
+            fields.append(pa.field(col, pa.dictionary(_smallest_int_type(pd.Series([len(categories)])), pa.string())))
+        elif col in INT_COLUMNS:
+            fields.append(pa.field(col, _smallest_int_type(df[col])))
+        elif col == "Date":
+            fields.append(pa.field(col, pa.date32()))
+        elif col == "Padded":
+            fields.append(pa.field(col, pa.bool_()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def write_clean_parquet(df, path: str = PARQUET_DIR) -> int:
+    # Rewrites the whole dataset; it is built next to the old one and swapped in
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    frame = add_derived_columns(df.copy())
+    frame["Date"] = frame["Date"].dt.date
+    for col in CATEGORY_COLUMNS:
+        frame[col] = frame[col].astype("category")
+    table = pa.Table.from_pandas(frame, schema=_schema(frame), preserve_index=False)
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(
+        table, tmp_path, format="parquet",
+        partitioning=ds.partitioning(table.select(PARTITION_COLUMNS).schema, flavor="hive"),
+        basename_template="part-{i}.parquet",
+        max_partitions=max(1024, len(frame.groupby(PARTITION_COLUMNS, observed=True).size())),
+    )
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return table.num_rows
+
+
+def load_clean(columns: Optional[List[str]] = None, routes: Optional[Iterable[str]] = None,
+               months: Optional[Iterable[str]] = None, start_date=None, end_date=None,
+               observed_only: bool = False, path: str = PARQUET_DIR):
+    # columns: only these columns are read (partition columns included);
+    # routes ("TPE-NRT"), months ("2025-06") and the date range are pushed down,
+    # so partitions and row groups that cannot match are never opened.
+    # observed_only leaves out the rows data_clean padded with monthly averages
+    # (data cleaned before they were marked has no way to tell them apart).
+    # Without the Parquet dataset (or pyarrow) it falls back to clean.csv.
+    if not os.path.isdir(path):
+        print(f"{path} not found, loading {CSV_FALLBACK}")
+        return _load_csv(columns, routes, months, start_date, end_date, observed_only)
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        print(f"pyarrow is not installed, loading {CSV_FALLBACK}")
+        return _load_csv(columns, routes, months, start_date, end_date, observed_only)
+
+    partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLUMNS]), flavor="hive")
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    conditions = []
+    if routes is not None:
+        conditions.append(ds.field("Route").isin(list(routes)))
+    if months is not None:
+        conditions.append(ds.field("Month").isin(list(months)))
+    if start_date is not None:
+        conditions.append(ds.field("Date") >= pa.scalar(_as_date(start_date), pa.date32()))
+    if end_date is not None:
+        conditions.append(ds.field("Date") <= pa.scalar(_as_date(end_date), pa.date32()))
+    if observed_only and "Padded" in dataset.schema.names:
+        conditions.append(~ds.field("Padded"))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    table = dataset.to_table(columns=columns, filter=condition)
+    int_types = {t: pd.api.types.pandas_dtype(f"Int{t.bit_width}")
+                 for t in (pa.int8(), pa.int16(), pa.int32(), pa.int64())}
+    df = table.to_pandas(types_mapper=int_types.get, date_as_object=False)
+    for col in VALUE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("Int64")  # Int16 prices would wrap around when added up
+    for col in PARTITION_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in ("From", "To") + tuple(PARTITION_COLUMNS):
+        if col in df.columns:
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+    if "Date" in df.columns:
+        df["Date"] = df["Date"].astype("datetime64[ns]")
+        df = df.sort_values(["From", "Date"] if "From" in df.columns else ["Date"], kind="stable").reset_index(drop=True)
+    return df
+
+
+def _as_date(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def _load_csv(columns, routes, months, start_date, end_date, observed_only=False):
+    df = add_derived_columns(pd.read_csv(CSV_FALLBACK))
+    if observed_only and "Padded" in df.columns:
+        df = df[~df["Padded"].astype(bool)]
+    if routes is not None:
+        df = df[df["Route"].isin(list(routes))]
+    if months is not None:
+        df = df[df["Month"].isin(list(months))]
+    if start_date is not None:
+        df = df[df["Date"] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df = df[df["Date"] <= pd.Timestamp(end_date)]
+    if columns is not None:
+        df = df[columns]
+    return df.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    # python clean_parquet.py: (re)build the dataset from clean.csv
+    data = pd.read_csv(CSV_FALLBACK)
+    print(f"Wrote {write_clean_parquet(data)} rows to {PARQUET_DIR}/")
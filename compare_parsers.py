@@ -0,0 +1,49 @@
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from data_clean import (
+    CSV_FILE,
+    convert_co2,
+    convert_duration_to_minutes,
+    convert_price,
+    convert_stops,
+    parse_co2_series,
+    parse_duration_series,
+    parse_price_series,
+    parse_stops_series,
+)
+
+# Times the vectorized parsers against the row-wise convert_* functions they
+# replaced. tests/test_parsers.py checks that both give the same values and messages.
+PARSERS = {
+    "Stops": (convert_stops, parse_stops_series),
+    "Flight Duration": (convert_duration_to_minutes, parse_duration_series),
+    "Price": (convert_price, parse_price_series),
+    "co2 emissions": (convert_co2, parse_co2_series),
+}
+
+
+def timed_quiet(func, series) -> float:
+    # Elapsed seconds, without the messages the parsers print
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        func(series)
+        return time.perf_counter() - started
+
+
+def main(scale: int = 500):
+    raw = pd.read_csv(CSV_FILE, encoding="utf-8")
+    big = pd.concat([raw] * scale, ignore_index=True)
+    print(f"Timing on {len(big)} rows ({CSV_FILE} x {scale})")
+    for name, (convert, parse) in PARSERS.items():
+        old_time = timed_quiet(lambda s: s.apply(convert).astype('Int64'), big[name])
+        new_time = timed_quiet(parse, big[name])
+        print(f"  {name:16} apply {old_time:7.3f}s  vectorized {new_time:7.3f}s  ({old_time / new_time:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
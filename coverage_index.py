@@ -0,0 +1,172 @@
+import hashlib
+import io
+import json
+import os
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Which (route, day) pairs have data, one bit each: row r of `bits` is route r,
+# bit d (little-endian within each byte) is first_day + d. 300 routes over a
+# year fit in about 14 KB. A saved index remembers how far into the source CSV
+# it has read, so later updates only parse the rows appended since.
+COVERAGE_FILE = "coverage.idx"
+READ_CHUNK_ROWS = 100_000
+
+
+def complete_size(path: str) -> int:
+    # Byte length of the file up to its last newline (ignores a row still being written)
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(65536, pos)
+            f.seek(pos - step)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return 0
+
+
+def file_fingerprint(path: str, offset: int) -> str:
+    # Hash of the start of the file and of the bytes just before offset,
+    # to notice a file that was rewritten rather than appended to
+    with open(path, "rb") as f:
+        head = f.read(min(offset, 65536))
+        f.seek(max(0, offset - 4096))
+        before = f.read(min(offset, 4096))
+    return hashlib.sha1(head + b"|" + before).hexdigest()
+
+
+class CoverageIndex:
+    def __init__(self, routes: Iterable[Tuple[str, str]], first_day, last_day):
+        self.routes: List[Tuple[str, str]] = sorted(set(routes))
+        self.route_ids: Dict[Tuple[str, str], int] = {route: i for i, route in enumerate(self.routes)}
+        self._key_ids = {f"{a}|{b}": i for (a, b), i in self.route_ids.items()}
+        self.first_day = pd.Timestamp(first_day).normalize()
+        self.days = (pd.Timestamp(last_day).normalize() - self.first_day).days + 1
+        self.bits = np.zeros((len(self.routes), (self.days + 7) // 8), dtype=np.uint8)
+        # Source CSV bookkeeping for update_from_csv
+        self.source: Optional[str] = None
+        self.offset = 0
+        self.fingerprint = ""
+
+    def add_many(self, from_airports, to_airports, dates) -> int:
+        # Marks the rows' route-days as covered; unknown routes and days out of range are ignored
+        keys = pd.Series(np.asarray(from_airports, dtype=object)) + "|" + pd.Series(np.asarray(to_airports, dtype=object))
+        route_ids = keys.map(self._key_ids)
+        days = (pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)), format="%Y-%m-%d", errors="coerce")
+                - self.first_day).dt.days
+        valid = (route_ids.notna() & days.between(0, self.days - 1)).to_numpy()
+        rows = route_ids.to_numpy()[valid].astype(np.int64)
+        days = days.to_numpy()[valid].astype(np.int64)
+        np.bitwise_or.at(self.bits, (rows, days >> 3), (1 << (days & 7)).astype(np.uint8))
+        return int(valid.sum())
+
+    def add(self, from_airport: str, to_airport: str, day: str):
+        self.add_many([from_airport], [to_airport], [day])
+
+    def _covered(self) -> np.ndarray:
+        # Boolean (route, day) matrix
+        return np.unpackbits(self.bits, axis=1, bitorder="little")[:, :self.days].astype(bool)
+
+    def _day_range(self, start, end) -> Tuple[int, int]:
+        lo = 0 if start is None else max(0, (pd.Timestamp(start) - self.first_day).days)
+        hi = self.days - 1 if end is None else min(self.days - 1, (pd.Timestamp(end) - self.first_day).days)
+        return lo, hi
+
+    def missing(self, start=None, end=None) -> Iterator[Tuple[str, str, str]]:
+        # (from, to, date) without data, sorted by route then date
+        lo, hi = self._day_range(start, end)
+        covered = self._covered()
+        day_names = [(self.first_day.date() + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(lo, hi + 1)]
+        for route_id, (from_airport, to_airport) in enumerate(self.routes):
+            for day in np.flatnonzero(~covered[route_id, lo:hi + 1]):
+                yield from_airport, to_airport, day_names[day]
+
+    def missing_count(self, start=None, end=None) -> int:
+        lo, hi = self._day_range(start, end)
+        return int((~self._covered()[:, lo:hi + 1]).sum())
+
+    def coverage(self, start=None, end=None) -> pd.Series:
+        # Percentage of days with data per route
+        lo, hi = self._day_range(start, end)
+        percent = self._covered()[:, lo:hi + 1].mean(axis=1) * 100 if hi >= lo else np.zeros(len(self.routes))
+        return pd.Series(percent, index=pd.MultiIndex.from_tuples(self.routes, names=["From", "To"]),
+                         name="coverage %")
+
+    def update_from_csv(self, csv_file: str) -> int:
+        # Applies the rows appended to csv_file since the last update; starts over if
+        # the file is a different one or was rewritten. Returns the rows read.
+        if (self.source != csv_file or complete_size(csv_file) < self.offset
+                or file_fingerprint(csv_file, self.offset) != self.fingerprint):
+            self.bits[:] = 0
+            self.source, self.offset = csv_file, 0
+        end = complete_size(csv_file)
+        rows = 0
+        if end > self.offset:
+            with open(csv_file, "rb") as f:
+                header = f.readline()
+                start = max(self.offset, len(header))
+                f.seek(start)
+                data = f.read(end - start)
+            names = pd.read_csv(io.BytesIO(header), encoding="utf-8", nrows=0).columns.tolist()
+            for chunk in pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=["From", "To", "Date"],
+                                     dtype=str, encoding="utf-8", chunksize=READ_CHUNK_ROWS):
+                self.add_many(chunk["From"], chunk["To"], chunk["Date"])
+                rows += len(chunk)
+        self.offset = end
+        self.fingerprint = file_fingerprint(csv_file, end)
+        return rows
+
+    def save(self, path: str = COVERAGE_FILE):
+        header = {
+            "routes": self.routes,
+            "first_day": self.first_day.strftime("%Y-%m-%d"),
+            "days": self.days,
+            "source": self.source,
+            "offset": self.offset,
+            "fingerprint": self.fingerprint,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(self.bits.tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = COVERAGE_FILE) -> "CoverageIndex":
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            data = f.read()
+        first_day = pd.Timestamp(header["first_day"])
+        index = cls([tuple(route) for route in header["routes"]], first_day,
+                    first_day + pd.Timedelta(days=header["days"] - 1))
+        index.bits = np.frombuffer(data, dtype=np.uint8).reshape(index.bits.shape).copy()
+        index.source, index.offset, index.fingerprint = header["source"], header["offset"], header["fingerprint"]
+        return index
+
+
+def coverage_for(csv_file: str, routes: Iterable[Tuple[str, str]], first_day, last_day,
+                 path: str = COVERAGE_FILE) -> CoverageIndex:
+    # The saved index if it covers the same routes and days, brought up to date with csv_file and saved again
+    wanted = CoverageIndex(routes, first_day, last_day)
+    try:
+        index = CoverageIndex.load(path)
+        if index.routes != wanted.routes or index.first_day != wanted.first_day or index.days != wanted.days:
+            index = wanted
+    except (FileNotFoundError, ValueError, KeyError):
+        index = wanted
+    index.update_from_csv(csv_file)
+    index.save(path)
+    return index
+
+
+def month_range(start_year: int, start_month: int, end_year: int, end_month: int) -> Tuple[date, date]:
+    # First and last day of a span of whole months
+    first = date(start_year, start_month, 1)
+    after = date(end_year + end_month // 12, end_month % 12 + 1, 1)
+    return first, after - timedelta(days=1)
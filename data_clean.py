@@ -1,7 +1,15 @@
+import csv
+import io
+import json
+import os
+import sys
+import numpy as np
 import pandas as pd
-import time
 import re
-from check_date import check_missing_dates
+from aggregates import CUBE_FILE, build_cube, load_cube, save_cube, update_cube
+from check_date import expected_routes
+from clean_parquet import PARQUET_DIR, write_clean_parquet
+from coverage_index import CoverageIndex, complete_size, file_fingerprint, month_range
 from scraper import COUNTRIES
 
 CSV_FILE = "best_flight_prices.csv"
@@ -97,7 +105,115 @@ def convert_co2(co2_str):
     print(f"Invalid co2 emissions input type: '{co2_str}' (type: {type(co2_str)})")
     return pd.NA
 
-def reading_raw_data():
+# Vectorized versions of the convert_* functions above. They give the same Int64
+# values, NA handling and messages. Each distinct raw value is parsed once with
+# pandas string methods and the result is broadcast back to the rows, so the cost
+# no longer grows with a Python call (and regex) per row.
+
+def _parse_column(series, label, parse_text):
+    # parse_text(non-empty strings) -> (float values, message or None per value)
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return pd.Series(pd.NA, index=series.index, dtype='Int64')
+    uniques = pd.Series(np.asarray(uniques, dtype=object))
+    values = np.full(len(uniques), np.nan)
+    messages = pd.Series(None, index=uniques.index, dtype=object)
+
+    str_mask = uniques.map(type).eq(str)
+    numbers = pd.to_numeric(uniques.where(~str_mask), errors="coerce").astype("float64")
+    values[~str_mask.to_numpy()] = np.trunc(numbers[~str_mask])
+    invalid = ~str_mask & numbers.isna()
+    messages[invalid] = [f"Invalid {label} input type: '{v}' (type: {type(v)})" for v in uniques[invalid]]
+
+    text = uniques[str_mask & (uniques != "")]
+    if not text.empty:
+        parsed, text_messages = parse_text(text.astype(str))
+        values[text.index.to_numpy()] = parsed.to_numpy(dtype="float64", na_value=np.nan)
+        messages[text.index] = text_messages
+
+    failed = messages.notna().to_numpy()
+    if failed.any():
+        for code in codes[(codes >= 0) & failed[np.maximum(codes, 0)]]:
+            print(messages[code])
+    result = np.where(codes >= 0, values[np.maximum(codes, 0)], np.nan)
+    return pd.Series(result, index=series.index).astype('Int64')
+
+def _stops_text(text):
+    text = text.str.lower().str.strip()
+    stops = pd.to_numeric(text.str.extract(r'(\d+)', expand=False), errors="coerce")
+    stops[text.str.contains("nonstop", regex=False)] = 0
+    messages = ("Failed to parse Stops value: '" + text + "'").where(stops.isna())
+    return stops, messages
+
+def _duration_text(text):
+    text = text.str.lower().str.replace(" ", "", regex=False)
+    has_hr = text.str.contains("hr", regex=False)
+    has_min = text.str.contains("min", regex=False)
+    parts = text.str.split("hr", regex=False)
+    hours = pd.to_numeric(parts.str[0].str.extract(r'(\d+)', expand=False), errors="coerce")
+    after_hr = parts.str[1].fillna("").str.replace("min", "", regex=False)
+    hr_minutes = pd.to_numeric(after_hr.str.extract(r'(\d+)', expand=False), errors="coerce").fillna(0)
+    only_minutes = pd.to_numeric(
+        text.str.replace("min", "", regex=False).str.extract(r'(\d+)', expand=False), errors="coerce"
+    )
+    minutes = pd.Series(0.0, index=text.index)
+    minutes[has_hr] = hours[has_hr] * 60 + hr_minutes[has_hr].where(has_min[has_hr], 0)
+    minutes[~has_hr & has_min] = only_minutes[~has_hr & has_min]
+    messages = pd.Series(None, index=text.index, dtype=object)
+    no_hours = has_hr & hours.isna()
+    no_minutes = ~has_hr & has_min & only_minutes.isna()
+    messages[no_hours] = "Error converting Flight Duration value '" + text[no_hours] + "': No hours found"
+    messages[no_minutes] = "Error converting Flight Duration value '" + text[no_minutes] + "': No minutes found"
+    return minutes, messages
+
+def _price_text(text):
+    cleaned = text.str.replace(r'[^\d.]', '', regex=True)
+    prices = pd.to_numeric(cleaned, errors="coerce")
+    messages = ("Error converting Price value '" + text + "': could not convert string to float: '"
+                + cleaned + "'").where(prices.isna())
+    return prices, messages
+
+def _co2_text(text):
+    number = text.str.replace(",", "", regex=False).str.extract(r'(\d+\.?\d*)', expand=False)
+    co2 = pd.to_numeric(number, errors="coerce")
+    messages = ("Failed to parse co2 emissions value: '" + text + "'").where(co2.isna())
+    return co2, messages
+
+def parse_stops_series(series):
+    return _parse_column(series, "Stops", _stops_text)
+
+def parse_duration_series(series):
+    return _parse_column(series, "Flight Duration", _duration_text)
+
+def parse_price_series(series):
+    return _parse_column(series, "Price", _price_text)
+
+def parse_co2_series(series):
+    return _parse_column(series, "co2 emissions", _co2_text)
+
+def clean_text_column(series):
+    # Strip non-ASCII characters and surrounding whitespace from the string values
+    # of a column; each distinct value is cleaned once
+    codes, uniques = pd.factorize(series)
+    cleaned = [v.encode('ascii', 'ignore').decode('ascii').strip() if isinstance(v, str) else v for v in uniques]
+    if len(cleaned) == 0 or all(a is b or a == b for a, b in zip(cleaned, uniques)):
+        return series, 0
+    changed = sum(a != b for a, b in zip(cleaned, uniques) if isinstance(b, str))
+    values = np.asarray(cleaned + [np.nan], dtype=object)[codes]  # code -1 (NaN) -> last entry
+    return pd.Series(values, index=series.index, name=series.name), changed
+
+def build_missing_rows(missing_keys, monthly_averages, columns):
+    # One frame holding every missing (From, To, Date) row, filled with the rounded
+    # monthly averages (left empty when that month has no data)
+    missing = pd.DataFrame(list(missing_keys), columns=["From", "To", "Date"])
+    missing["Date"] = pd.to_datetime(missing["Date"])
+    averages = monthly_averages.set_index("Month")
+    months = missing["Date"].dt.to_period("M")
+    for col in ["Stops", "Flight Duration", "Price", "co2 emissions"]:
+        missing[col] = months.map(averages[col]).astype("float64").round().astype("Int64")
+    return missing.reindex(columns=list(dict.fromkeys(list(columns) + list(missing.columns))))
+
+def reading_raw_data(verbose=False):
     try:
         df = pd.read_csv(CSV_FILE, encoding="utf-8")
     except FileNotFoundError:
@@ -107,28 +223,25 @@ def reading_raw_data():
     # Drop unnecessary columns early
     df = df.drop(columns=["Departure Time", "Arrival Time", "Airline Company", "emissions variation"], errors='ignore')
 
-    # Clean unwanted characters in all string columns
-    def clean_text(value):
-        if isinstance(value, str):
-            return value.encode('ascii', 'ignore').decode('ascii').strip()
-        return value
-
     print("Starting to read and clean data...")
-    cleaned_rows = []
-    counter = 0
 
     # Debug: Print first few rows of raw data
     print("Sample of raw data:")
     print(df.head(5).to_string())
 
-    for index, row in df.iterrows():
-        print(f"Reading row {counter + 1}: From {row.get('From', '')} to {row.get('To', '')} on {row.get('Date', '')}")
-        cleaned_row = {col: (clean_text(row[col]) if col in row else "") for col in df.columns}
-        cleaned_rows.append(cleaned_row)
-        counter += 1
-        time.sleep(0.01)
+    if verbose:
+        for counter, (from_airport, to_airport, date) in enumerate(
+                zip(df.get("From", [""] * len(df)), df.get("To", [""] * len(df)), df.get("Date", [""] * len(df)))):
+            print(f"Reading row {counter + 1}: From {from_airport} to {to_airport} on {date}")
 
-    df_cleaned = pd.DataFrame(cleaned_rows)
+    # Clean unwanted characters in all string columns, one column at a time
+    df_cleaned = df.copy()
+    changed_values = 0
+    for col in df_cleaned.columns:
+        if df_cleaned[col].dtype == object:
+            df_cleaned[col], changed = clean_text_column(df_cleaned[col])
+            changed_values += changed
+    print(f"Read {len(df_cleaned)} rows; {changed_values} distinct values had non-ASCII characters or padding removed")
 
     # Ensure all columns are present
     expected_columns = ["From", "To", "Date", "Flight Duration", "Stops", "Price", "co2 emissions"]
@@ -138,10 +251,10 @@ def reading_raw_data():
 
     # Convert critical columns to appropriate types
     df_cleaned["Date"] = pd.to_datetime(df_cleaned["Date"], errors='coerce')
-    df_cleaned["Stops"] = df_cleaned["Stops"].apply(convert_stops).astype('Int64')
-    df_cleaned["Flight Duration"] = df_cleaned["Flight Duration"].apply(convert_duration_to_minutes).astype('Int64')
-    df_cleaned["Price"] = df_cleaned["Price"].apply(convert_price).astype('Int64')
-    df_cleaned["co2 emissions"] = df_cleaned["co2 emissions"].apply(convert_co2).astype('Int64')
+    df_cleaned["Stops"] = parse_stops_series(df_cleaned["Stops"])
+    df_cleaned["Flight Duration"] = parse_duration_series(df_cleaned["Flight Duration"])
+    df_cleaned["Price"] = parse_price_series(df_cleaned["Price"])
+    df_cleaned["co2 emissions"] = parse_co2_series(df_cleaned["co2 emissions"])
 
     # Use check_date to get missing entries
     start_year = 2025
@@ -149,10 +262,10 @@ def reading_raw_data():
     end_year = 2025
     end_month = 8
 
-    missing_entries = check_missing_dates(CSV_FILE, start_year, start_month, end_year, end_month)
-    if missing_entries is None:
-        print("No data to check.")
-        return df_cleaned
+    # Route-days without data, from a coverage bitmap of the rows read above
+    first_day, last_day = month_range(start_year, start_month, end_year, end_month)
+    coverage = CoverageIndex(expected_routes(), first_day, last_day)
+    coverage.add_many(df_cleaned["From"], df_cleaned["To"], df_cleaned["Date"].dt.strftime('%Y-%m-%d'))
 
     # Calculate monthly averages
     monthly_averages = df_cleaned.groupby(df_cleaned["Date"].dt.to_period("M")).agg({
@@ -162,51 +275,28 @@ def reading_raw_data():
         "co2 emissions": "mean"
     }).rename_axis("Month").reset_index()
 
-    def build_row_with_averages(from_airport, to_airport, date, monthly_averages):
-        month_period = date.to_period("M")
-        avg_row = monthly_averages[monthly_averages["Month"] == month_period]
-        if not avg_row.empty:
-            avg_stops = int(round(avg_row["Stops"].values[0])) if pd.notna(avg_row["Stops"].values[0]) else None
-            avg_duration = int(round(avg_row["Flight Duration"].values[0])) if pd.notna(avg_row["Flight Duration"].values[0]) else None
-            avg_price = int(round(avg_row["Price"].values[0])) if pd.notna(avg_row["Price"].values[0]) else None
-            avg_co2 = int(round(avg_row["co2 emissions"].values[0])) if pd.notna(avg_row["co2 emissions"].values[0]) else None
-        else:
-            avg_stops = avg_duration = avg_price = avg_co2 = None
-
-        new_row = {col: "" for col in expected_columns}
-        new_row["From"] = from_airport
-        new_row["To"] = to_airport
-        new_row["Date"] = date
-        new_row["Stops"] = avg_stops
-        new_row["Flight Duration"] = avg_duration
-        new_row["Price"] = avg_price
-        new_row["co2 emissions"] = avg_co2
-
-        return new_row
-
-    # Build rows for missing dates
-    existing_keys = set(zip(df_cleaned["From"], df_cleaned["To"], df_cleaned["Date"].dt.strftime('%Y-%m-%d')))
-    added_count = 0
-    for from_airport, to_airport, date_str in missing_entries:
-        key = (from_airport, to_airport, date_str)
-        if key not in existing_keys:
-            date = pd.to_datetime(date_str)
-            new_row = build_row_with_averages(from_airport, to_airport, date, monthly_averages)
-            df_cleaned = pd.concat([df_cleaned, pd.DataFrame([new_row])], ignore_index=True)
-            added_count += 1
-            print(f"Added missing row with averages: From {from_airport} to {to_airport} on {date}")
+    # Build rows for missing dates, all at once; "Padded" marks them in the clean
+    # output so fare queries can leave out prices that were never scraped
+    df_cleaned["Padded"] = False
+    to_add = list(coverage.missing())
+    if to_add:
+        missing_rows = build_missing_rows(to_add, monthly_averages, df_cleaned.columns)
+        missing_rows["Padded"] = True
+        df_cleaned = pd.concat([df_cleaned, missing_rows], ignore_index=True)
+        if verbose:
+            for from_airport, to_airport, date in zip(missing_rows["From"], missing_rows["To"], missing_rows["Date"]):
+                print(f"Added missing row with averages: From {from_airport} to {to_airport} on {date}")
+    print(f"Added {len(to_add)} missing rows with monthly averages")
+    df_cleaned.attrs["padded_rows"] = len(to_add)
 
     print(f"Data reading complete. Total raw rows in DataFrame: {len(df_cleaned)}")
     return df_cleaned
 
-def clean_data(df=None):
-    if df is None:
-        try:
-            df = pd.read_csv(CSV_FILE, encoding="utf-8")
-        except FileNotFoundError:
-            print(f"CSV file {CSV_FILE} not found.")
-            return None
+VALUE_COLUMNS = ["Stops", "Flight Duration", "Price", "co2 emissions"]
 
+def prepare_clean_frame(df):
+    # Type conversion, NaN report, drops, dedupe and route filter of clean_data;
+    # returns the rows to keep with a Month column, before any imputation
     # Drop unnecessary columns early
     df = df.drop(columns=["Departure Time", "Arrival Time", "Airline Company", "emissions variation"], errors='ignore')
 
@@ -217,11 +307,11 @@ def clean_data(df=None):
         return None
 
     # Convert critical columns
-    df["Stops"] = df["Stops"].apply(convert_stops).astype('Int64')
-    df["Flight Duration"] = df["Flight Duration"].apply(convert_duration_to_minutes).astype('Int64')
-    df["Price"] = df["Price"].apply(convert_price).astype('Int64')
+    df["Stops"] = parse_stops_series(df["Stops"])
+    df["Flight Duration"] = parse_duration_series(df["Flight Duration"])
+    df["Price"] = parse_price_series(df["Price"])
     df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-    df["co2 emissions"] = df["co2 emissions"].apply(convert_co2).astype('Int64')
+    df["co2 emissions"] = parse_co2_series(df["co2 emissions"])
 
     print(f"After converting Stops, NaNs count: {df['Stops'].isna().sum()}")
     print(f"After converting Flight Duration, NaNs count: {df['Flight Duration'].isna().sum()}")
@@ -252,54 +342,23 @@ def clean_data(df=None):
 
     # Filter by allowed airports
     allowed_airports = {airport for _, airport in COUNTRIES}
-    def is_allowed_route(row):
-        return (row.get("From") in allowed_airports) or (row.get("To") in allowed_airports)
-
-    df = df[df.apply(is_allowed_route, axis=1)]
+    df = df[df["From"].isin(allowed_airports) | df["To"].isin(allowed_airports)].copy()
     print(f"After filtering allowed routes, remaining rows: {len(df)}")
 
-    # Calculate monthly averages
     df["Month"] = df["Date"].dt.to_period("M")
-    monthly_averages = df.groupby(["From", "To", "Month"]).agg({
-        "Stops": "mean",
-        "Flight Duration": "mean",
-        "Price": "mean",
-        "co2 emissions": "mean"
-    }).reset_index()
-
-    # Fill missing or zero values with monthly averages
-    def is_missing_or_zero(row):
-        return (
-            pd.isna(row["Stops"]) or row["Stops"] == 0 or
-            pd.isna(row["Flight Duration"]) or row["Flight Duration"] == 0 or
-            pd.isna(row["Price"]) or row["Price"] == 0 or
-            pd.isna(row["co2 emissions"]) or row["co2 emissions"] == 0
-        )
-
-    missing_mask = df.apply(is_missing_or_zero, axis=1)
-    missing_rows = df[missing_mask]
-
-    for idx, row in missing_rows.iterrows():
-        from_airport = row["From"]
-        to_airport = row["To"]
-        month = row["Month"]
-        avg_row = monthly_averages[
-            (monthly_averages["From"] == from_airport) &
-            (monthly_averages["To"] == to_airport) &
-            (monthly_averages["Month"] == month)
-        ]
-        if not avg_row.empty:
-            if pd.isna(row["Stops"]) or row["Stops"] == 0:
-                df.at[idx, "Stops"] = int(round(avg_row["Stops"].values[0])) if pd.notna(avg_row["Stops"].values[0]) else pd.NA
-            if pd.isna(row["Flight Duration"]) or row["Flight Duration"] == 0:
-                df.at[idx, "Flight Duration"] = int(round(avg_row["Flight Duration"].values[0])) if pd.notna(avg_row["Flight Duration"].values[0]) else pd.NA
-            if pd.isna(row["Price"]) or row["Price"] == 0:
-                df.at[idx, "Price"] = int(round(avg_row["Price"].values[0])) if pd.notna(avg_row["Price"].values[0]) else pd.NA
-            if pd.isna(row["co2 emissions"]) or row["co2 emissions"] == 0:
-                df.at[idx, "co2 emissions"] = int(round(avg_row["co2 emissions"].values[0])) if pd.notna(avg_row["co2 emissions"].values[0]) else pd.NA
+    return df
+
+def fill_with_averages(df, monthly_averages):
+    # Replace missing or zero values with the rounded (From, To, Month) average;
+    # monthly_averages is aligned with df's rows
+    for col in VALUE_COLUMNS:
+        fill = df[col].isna() | (df[col] == 0)
+        df.loc[fill, col] = monthly_averages.loc[fill, col].round().astype("Int64")
+    return df
 
+def save_clean_frame(df, output_file="clean.csv", parquet_dir=PARQUET_DIR, cube_file=CUBE_FILE, touched=None):
     # Drop Month column
-    df = df.drop(columns=["Month"])
+    df = df.drop(columns=["Month"], errors='ignore')
 
     # Sort by 'From' and 'Date'
     if "From" in df.columns and "Date" in df.columns:
@@ -308,12 +367,213 @@ def clean_data(df=None):
         print("Warning: 'From' or 'Date' column missing, skipping sort.")
 
     # Save cleaned data
-    df.to_csv("clean.csv", index=False)
-    print("Cleaned data saved to clean.csv")
+    df.to_csv(output_file, index=False)
+    print(f"Cleaned data saved to {output_file}")
+
+    # Typed, partitioned copy for load_clean(); optional because it needs pyarrow
+    try:
+        rows = write_clean_parquet(df, parquet_dir)
+        print(f"Cleaned data saved to {parquet_dir}/ ({rows} rows, partitioned by month and route)")
+    except ImportError:
+        print(f"pyarrow is not installed, skipping {parquet_dir}/")
+
+    # Aggregate cube for the notebook; with `touched` rows only their cells are recomputed
+    if touched is not None and os.path.exists(cube_file):
+        cube = update_cube(load_cube(cube_file), df, touched)
+    else:
+        cube = build_cube(df)
+    save_cube(cube, cube_file)
+    print(f"Aggregate cube saved to {cube_file} ({len(cube)} cells)")
+    return df
+
+def clean_data(df=None):
+    if df is None:
+        try:
+            df = pd.read_csv(CSV_FILE, encoding="utf-8")
+        except FileNotFoundError:
+            print(f"CSV file {CSV_FILE} not found.")
+            return None
+
+    df = prepare_clean_frame(df)
+    if df is None or df.empty:
+        return df
+
+    # Fill missing or zero values with the route's monthly average
+    monthly_averages = df.groupby(["From", "To", "Month"])[VALUE_COLUMNS].transform("mean")
+    df = fill_with_averages(df, monthly_averages)
+
+    df = save_clean_frame(df)
     print(f"Data cleaning complete. Total cleaned rows in DataFrame: {len(df)}")
     return df
 
-if __name__ == "__main__":
+# Incremental cleaning: clean_state.json remembers how far into CSV_FILE the
+# cleaned output goes (byte offset plus a fingerprint of the bytes before it),
+# the per-(From, To, Month) sums behind the monthly averages, and the rows that
+# reading_raw_data padded with averages. A run then only reads the appended tail.
+# Rows cleaned earlier are not re-imputed; delete the state file for a full rebuild.
+STATE_FILE = "clean_state.json"
+READ_CHUNK_ROWS = 50_000
+
+def _row_keys(df):
+    return list(zip(df["From"], df["To"], df["Date"].dt.strftime('%Y-%m-%d')))
+
+def monthly_sums(df):
+    # {"FROM|TO|YYYY-MM": {column: [sum, count]}} of the non-NA values
+    grouped = df.groupby(["From", "To", df["Month"].astype(str)])[VALUE_COLUMNS]
+    sums, counts = grouped.sum(), grouped.count()
+    return {
+        "|".join(key): {col: [float(sums.at[key, col]), int(counts.at[key, col])] for col in VALUE_COLUMNS}
+        for key in sums.index
+    }
+
+def merge_sums(total, delta, sign=1):
+    for key, columns in delta.items():
+        entry = total.setdefault(key, {col: [0.0, 0] for col in VALUE_COLUMNS})
+        for col, (value_sum, count) in columns.items():
+            entry[col][0] += sign * value_sum
+            entry[col][1] += sign * count
+    return total
+
+def averages_from_sums(df, sums):
+    # Monthly averages aligned with df's rows, as fill_with_averages expects
+    keys = df["From"] + "|" + df["To"] + "|" + df["Month"].astype(str)
+    averages = pd.DataFrame(index=df.index)
+    for col in VALUE_COLUMNS:
+        means = {key: (s[col][0] / s[col][1] if s[col][1] else np.nan) for key, s in sums.items()}
+        averages[col] = keys.map(means).astype("float64")
+    return averages
+
+def _save_state(state, state_file):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def _padded_records(df):
+    return [
+        [row["From"], row["To"], row["Date"].strftime('%Y-%m-%d')]
+        + [None if pd.isna(row[col]) else int(row[col]) for col in VALUE_COLUMNS]
+        for row in df.to_dict("records")
+    ]
+
+def clean_full(state_file=STATE_FILE, output_file="clean.csv"):
+    # Full reading_raw_data + clean_data pass that also writes the incremental state
+    offset = complete_size(CSV_FILE) if os.path.exists(CSV_FILE) else 0
     df_raw = reading_raw_data()
-    if df_raw is not None:
-        df_cleaned = clean_data(df_raw)
\ No newline at end of file
+    if df_raw is None:
+        return None
+    padded_count = df_raw.attrs.get("padded_rows", 0)
+    padded_keys = set(_row_keys(df_raw.tail(padded_count))) if padded_count else set()
+    df = prepare_clean_frame(df_raw)
+    if df is None or df.empty:
+        return df
+    sums = monthly_sums(df)
+    padded = df[[key in padded_keys for key in _row_keys(df)]]
+    df = fill_with_averages(df, df.groupby(["From", "To", "Month"])[VALUE_COLUMNS].transform("mean"))
+    df = save_clean_frame(df, output_file)
+    with open(CSV_FILE, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f))
+    _save_state({
+        "offset": offset,
+        "fingerprint": file_fingerprint(CSV_FILE, offset),
+        "header": header,
+        "padded": _padded_records(padded),
+        "groups": sums,
+    }, state_file)
+    print(f"Data cleaning complete. Total cleaned rows in DataFrame: {len(df)}")
+    return df
+
+def _read_tail(start, end, header):
+    # Parse bytes [start, end) of CSV_FILE in chunks, converting each chunk as it is read
+    with open(CSV_FILE, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunks = []
+    for chunk in pd.read_csv(io.BytesIO(data), header=None, names=header, encoding="utf-8",
+                             chunksize=READ_CHUNK_ROWS):
+        chunk = chunk.drop(columns=["Departure Time", "Arrival Time", "Airline Company", "emissions variation"],
+                           errors='ignore')
+        for col in chunk.columns:
+            if chunk[col].dtype == object:
+                chunk[col], _ = clean_text_column(chunk[col])
+        chunk["Date"] = pd.to_datetime(chunk["Date"], errors='coerce')
+        chunk["Stops"] = parse_stops_series(chunk["Stops"])
+        chunk["Flight Duration"] = parse_duration_series(chunk["Flight Duration"])
+        chunk["Price"] = parse_price_series(chunk["Price"])
+        chunk["co2 emissions"] = parse_co2_series(chunk["co2 emissions"])
+        chunks.append(chunk.dropna(subset=["From", "To", "Date"]))
+    return pd.concat(chunks, ignore_index=True)
+
+def clean_incremental(state_file=STATE_FILE, output_file="clean.csv"):
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        print(f"No usable {state_file}, running a full clean.")
+        return clean_full(state_file, output_file)
+    end = complete_size(CSV_FILE)
+    if (end < state["offset"] or file_fingerprint(CSV_FILE, state["offset"]) != state["fingerprint"]
+            or not os.path.exists(output_file)):
+        print(f"{CSV_FILE} or {output_file} changed since the last run, running a full clean.")
+        return clean_full(state_file, output_file)
+
+    existing = pd.read_csv(output_file, encoding="utf-8", parse_dates=["Date"])
+    for col in VALUE_COLUMNS:
+        existing[col] = existing[col].astype("Int64")
+    if "Padded" not in existing.columns:  # written before the column existed
+        padded_keys = {tuple(record[:3]) for record in state["padded"]}
+        existing["Padded"] = [key in padded_keys for key in _row_keys(existing)]
+    if end == state["offset"]:
+        print(f"No new rows in {CSV_FILE} since the last run.")
+        return existing
+
+    new = _read_tail(state["offset"], end, state["header"])
+    print(f"Read {len(new)} new rows ({end - state['offset']} bytes) from {CSV_FILE}")
+    new = new.drop_duplicates(subset=["From", "To", "Date"])
+    allowed_airports = {airport for _, airport in COUNTRIES}
+    new = new[new["From"].isin(allowed_airports) | new["To"].isin(allowed_airports)].copy()
+
+    # Keys already cleaned keep their first row, except rows padded with averages,
+    # which are replaced by the real data
+    padded = {tuple(record[:3]): record for record in state["padded"]}
+    real_keys = set(_row_keys(existing)) - set(padded)
+    new = new[[key not in real_keys for key in _row_keys(new)]].copy()
+    replaced = {key for key in _row_keys(new) if key in padded}
+
+    sums = state["groups"]
+    if replaced:
+        old_rows = pd.DataFrame([padded[key] for key in replaced], columns=["From", "To", "Date"] + VALUE_COLUMNS)
+        old_rows["Date"] = pd.to_datetime(old_rows["Date"])
+        old_rows["Month"] = old_rows["Date"].dt.to_period("M")
+        for col in VALUE_COLUMNS:
+            old_rows[col] = old_rows[col].astype("Int64")
+        merge_sums(sums, monthly_sums(old_rows), sign=-1)
+    new["Month"] = new["Date"].dt.to_period("M")
+    new["Padded"] = False
+    if not new.empty:
+        merge_sums(sums, monthly_sums(new))
+        new = fill_with_averages(new, averages_from_sums(new, sums))
+
+    is_replaced = [key in replaced for key in _row_keys(existing)]
+    kept = existing[[not flag for flag in is_replaced]]
+    new = new.drop(columns=["Month"])
+    df = save_clean_frame(pd.concat([kept, new], ignore_index=True), output_file,
+                          touched=pd.concat([existing[is_replaced], new], ignore_index=True))
+    _save_state({
+        "offset": end,
+        "fingerprint": file_fingerprint(CSV_FILE, end),
+        "header": state["header"],
+        "padded": [record for key, record in padded.items() if key not in replaced],
+        "groups": sums,
+    }, state_file)
+    print(f"Added {len(new)} rows ({len(replaced)} replacing rows padded with averages). "
+          f"Total cleaned rows: {len(df)}")
+    return df
+
+if __name__ == "__main__":
+    if "--incremental" in sys.argv:
+        clean_incremental()
+    else:
+        df_raw = reading_raw_data()
+        if df_raw is not None:
+            df_cleaned = clean_data(df_raw)
\ No newline at end of file
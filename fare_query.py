@@ -0,0 +1,190 @@
+import argparse
+import heapq
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from clean_parquet import load_clean
+from scraper import COUNTRIES, TAIWAN
+
+# Cheapest-fare queries over the cleaned data. Every route gets its daily price
+# series on a calendar shared by all routes (days without a price are inf) and a
+# sparse table over it, so the cheapest day in any date range is an O(1) lookup.
+# Top-k answers pop the cheapest day of a range and split the range around it;
+# round trips do the same with one return-day range per outbound day.
+MIN_STAY = 5
+MAX_STAY = 14
+
+
+class SparseTableMin:
+    # table[k][i] is the index of the smallest value in values[i : i + 2**k];
+    # ties go to the earlier index (the earlier date)
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype="float64")
+        n = len(self.values)
+        self.table = [np.arange(n)]
+        k = 1
+        while (1 << k) <= n:
+            prev = self.table[-1]
+            width = n - (1 << k) + 1
+            left, right = prev[:width], prev[(1 << (k - 1)):(1 << (k - 1)) + width]
+            self.table.append(np.where(self.values[right] < self.values[left], right, left))
+            k += 1
+
+    def argmin(self, lo: int, hi: int) -> int:
+        # Index of the smallest value in values[lo..hi] (inclusive)
+        k = (hi - lo + 1).bit_length() - 1
+        a = self.table[k][lo]
+        b = self.table[k][hi - (1 << k) + 1]
+        return int(b) if self.values[b] < self.values[a] else int(a)
+
+
+class FareIndex:
+    # Built from scraped prices only: a day data_clean padded with the monthly
+    # average of all routes is a day without a price, not a cheap (or dear) fare
+    def __init__(self, df):
+        if "Padded" in df.columns:
+            df = df[~df["Padded"].astype(bool)]
+        df = df.dropna(subset=["Price"])
+        dates = pd.to_datetime(df["Date"]).dt.normalize()
+        self.first_day = dates.min()
+        self.days = (dates.max() - self.first_day).days + 1
+        self.routes: Dict[Tuple[str, str], SparseTableMin] = {}
+        frame = pd.DataFrame({
+            "From": df["From"].astype(str),
+            "To": df["To"].astype(str),
+            "Day": (dates - self.first_day).dt.days,
+            "Price": df["Price"].astype("float64"),
+        })
+        for route, rows in frame.groupby(["From", "To"]):
+            series = np.full(self.days, np.inf)
+            series[rows["Day"].to_numpy()] = rows["Price"].to_numpy()
+            self.routes[route] = SparseTableMin(series)
+
+    @classmethod
+    def load(cls, **filters):
+        return cls(load_clean(columns=["From", "To", "Date", "Price"], observed_only=True, **filters))
+
+    def date(self, day: int) -> str:
+        return (self.first_day + pd.Timedelta(days=day)).strftime("%Y-%m-%d")
+
+    def _days(self, start: Optional[str], end: Optional[str]) -> Tuple[int, int]:
+        lo = 0 if start is None else max(0, (pd.Timestamp(start) - self.first_day).days)
+        hi = self.days - 1 if end is None else min(self.days - 1, (pd.Timestamp(end) - self.first_day).days)
+        return lo, hi
+
+    def _route(self, from_airport: str, to_airport: str) -> SparseTableMin:
+        try:
+            return self.routes[(from_airport, to_airport)]
+        except KeyError:
+            raise KeyError(f"No prices for {from_airport}->{to_airport}") from None
+
+    def cheapest(self, from_airport: str, to_airport: str, start: str = None, end: str = None,
+                 k: int = 1) -> List[Tuple[str, float]]:
+        # The k cheapest (date, price) between start and end, cheapest first
+        table = self._route(from_airport, to_airport)
+        heap = []
+
+        def push(lo, hi):
+            if lo <= hi:
+                day = table.argmin(lo, hi)
+                if np.isfinite(table.values[day]):
+                    heapq.heappush(heap, (table.values[day], day, lo, hi))
+
+        push(*self._days(start, end))
+        results = []
+        while heap and len(results) < k:
+            price, day, lo, hi = heapq.heappop(heap)
+            results.append((self.date(day), float(price)))
+            push(lo, day - 1)
+            push(day + 1, hi)
+        return results
+
+    def round_trips(self, outbound: Tuple[str, str], inbound: Tuple[str, str], start: str = None,
+                    end: str = None, min_stay: int = MIN_STAY, max_stay: int = MAX_STAY,
+                    k: int = 1) -> List[Dict]:
+        # The k cheapest (outbound day, return day) pairs with the outbound day between
+        # start and end and min_stay..max_stay days between the two flights
+        out_table, in_table = self._route(*outbound), self._route(*inbound)
+        heap = []
+
+        def push(out_day, lo, hi):
+            hi = min(hi, self.days - 1)
+            if lo <= hi:
+                day = in_table.argmin(lo, hi)
+                if np.isfinite(in_table.values[day]):
+                    total = out_table.values[out_day] + in_table.values[day]
+                    heapq.heappush(heap, (total, out_day, day, lo, hi))
+
+        lo, hi = self._days(start, end)
+        for out_day in range(lo, hi + 1):
+            if np.isfinite(out_table.values[out_day]):
+                push(out_day, out_day + min_stay, out_day + max_stay)
+
+        results = []
+        while heap and len(results) < k:
+            total, out_day, in_day, lo, hi = heapq.heappop(heap)
+            results.append({
+                "outbound": f"{outbound[0]}->{outbound[1]}",
+                "depart": self.date(out_day),
+                "depart_price": float(out_table.values[out_day]),
+                "return": self.date(in_day),
+                "return_price": float(in_table.values[in_day]),
+                "stay": in_day - out_day,
+                "total": float(total),
+            })
+            push(out_day, lo, in_day - 1)
+            push(out_day, in_day + 1, hi)
+        return results
+
+    def best_round_trips(self, airport: str, home: str = TAIWAN, start: str = None, end: str = None,
+                         min_stay: int = MIN_STAY, max_stay: int = MAX_STAY, k: int = 1) -> List[Dict]:
+        # Both ways around: leaving from home and coming back, or visiting home from airport
+        results = []
+        for outbound, inbound in (((home, airport), (airport, home)), ((airport, home), (home, airport))):
+            if outbound in self.routes and inbound in self.routes:
+                results += self.round_trips(outbound, inbound, start, end, min_stay, max_stay, k)
+        return sorted(results, key=lambda r: (r["total"], r["depart"]))[:k]
+
+
+def main(argv=None):
+    airports = [airport for _, airport in COUNTRIES]
+    parser = argparse.ArgumentParser(description="Cheapest fares from the cleaned flight data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cheapest = commands.add_parser("cheapest", help="cheapest days to fly one route")
+    cheapest.add_argument("from_airport")
+    cheapest.add_argument("to_airport")
+
+    round_trip = commands.add_parser("roundtrip", help=f"cheapest round trips between {TAIWAN} and an airport")
+    round_trip.add_argument("airport", choices=airports)
+    round_trip.add_argument("--min-stay", type=int, default=MIN_STAY)
+    round_trip.add_argument("--max-stay", type=int, default=MAX_STAY)
+
+    for command in (cheapest, round_trip):
+        command.add_argument("--start", help="first departure date (YYYY-MM-DD)")
+        command.add_argument("--end", help="last departure date (YYYY-MM-DD)")
+        command.add_argument("-k", type=int, default=5, help="number of results")
+    args = parser.parse_args(argv)
+
+    index = FareIndex.load()
+    try:
+        if args.command == "cheapest":
+            for date, price in index.cheapest(args.from_airport, args.to_airport, args.start, args.end, args.k):
+                print(f"{args.from_airport}->{args.to_airport} {date}  {price:,.0f}")
+        else:
+            for trip in index.best_round_trips(args.airport, TAIWAN, args.start, args.end,
+                                               args.min_stay, args.max_stay, args.k):
+                print(f"{trip['outbound']} {trip['depart']} ({trip['depart_price']:,.0f}) + "
+                      f"return {trip['return']} ({trip['return_price']:,.0f}), "
+                      f"{trip['stay']} days: {trip['total']:,.0f}")
+    except KeyError as e:
+        print(e.args[0])
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
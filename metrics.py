@@ -0,0 +1,174 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Stage timings and search outcome counters for scraper runs. Recording is a
+# perf_counter call, a bisect and a few dict increments per event, so it stays
+# on; the totals since the process started are written at the end of each run
+# as a Prometheus textfile (for node_exporter's textfile collector) and a JSON
+# summary. Set either file to "" to skip it.
+METRICS_FILE = os.environ.get("SCRAPER_METRICS_FILE", "scraper_metrics.prom")
+SUMMARY_FILE = os.environ.get("SCRAPER_METRICS_SUMMARY", "scraper_metrics.json")
+# Histogram upper bounds in seconds; page loads are capped at 60s and the results wait at 40s
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+OUTCOMES = ("success", "empty", "timeout", "blocked", "error", "cached")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation,
+        # like Prometheus' histogram_quantile; the +Inf bucket reports the max
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.buckets):
+                    return self.max
+                lower = self.buckets[i - 1] if i else 0.0
+                return min(self.max, lower + (self.buckets[i] - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.stages: Dict[Tuple, Histogram] = defaultdict(Histogram)  # (stage, labels) -> timings
+        self.routes = defaultdict(int)  # (route, outcome) -> searches
+        self.workers = defaultdict(int)  # (worker, outcome) -> searches
+        self.rows = defaultdict(int)  # sink -> rows written
+        self.runs = 0
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        # Times the block, including blocks that raise (a timed-out goto counts its full wait)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[(name, tuple(sorted(labels.items())))].observe(time.perf_counter() - start)
+
+    def search(self, from_airport: str, to_airport: str, worker, outcome: str):
+        self.routes[(f"{from_airport}-{to_airport}", outcome)] += 1
+        self.workers[(str(worker), outcome)] += 1
+
+    def written(self, sink: str, rows: int):
+        self.rows[sink] += rows
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP scraper_stage_seconds Time spent in each stage of a search or write.",
+            "# TYPE scraper_stage_seconds histogram",
+        ]
+        for (name, labels), h in sorted(self.stages.items()):
+            base = (("stage", name),) + labels
+            cumulative = 0
+            for bound, n in zip([f"{b:g}" for b in h.buckets] + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append(f"scraper_stage_seconds_bucket{_labels(base + (('le', bound),))} {cumulative}")
+            lines.append(f"scraper_stage_seconds_sum{_labels(base)} {h.sum:.6f}")
+            lines.append(f"scraper_stage_seconds_count{_labels(base)} {h.count}")
+        for metric, help_text, counts, label in (
+            ("scraper_route_searches_total", "Searches per route and outcome.", self.routes, "route"),
+            ("scraper_worker_searches_total", "Searches per worker and outcome.", self.workers, "worker"),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (key, outcome), n in sorted(counts.items()):
+                lines.append(f"{metric}{_labels(((label, key), ('outcome', outcome)))} {n}")
+        lines += ["# HELP scraper_rows_written_total Rows written per sink.", "# TYPE scraper_rows_written_total counter"]
+        for sink, n in sorted(self.rows.items()):
+            lines.append(f"scraper_rows_written_total{_labels((('sink', sink),))} {n}")
+        lines += [
+            "# HELP scraper_runs_total Scraper runs finished by this process.",
+            "# TYPE scraper_runs_total counter",
+            f"scraper_runs_total {self.runs}",
+            "# HELP scraper_last_run_timestamp_seconds When the last run finished.",
+            "# TYPE scraper_last_run_timestamp_seconds gauge",
+            f"scraper_last_run_timestamp_seconds {time.time():.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict:
+        def by_outcome(counts):
+            grouped = defaultdict(dict)
+            for (key, outcome), n in sorted(counts.items()):
+                grouped[key][outcome] = n
+            return dict(grouped)
+
+        stages = {}
+        for (name, labels), h in sorted(self.stages.items()):
+            key = name + "".join(f" {k}={v}" for k, v in labels)
+            stages[key] = {
+                "count": h.count,
+                "total_s": round(h.sum, 3),
+                "mean_s": round(h.sum / h.count, 4) if h.count else 0.0,
+                "p50_s": round(h.quantile(0.5), 4),
+                "p95_s": round(h.quantile(0.95), 4),
+                "max_s": round(h.max, 4),
+            }
+        return {
+            "started": self.started,
+            "finished": time.time(),
+            "runs": self.runs,
+            "stages": stages,
+            "routes": by_outcome(self.routes),
+            "workers": by_outcome(self.workers),
+            "rows_written": dict(sorted(self.rows.items())),
+        }
+
+    def export(self, metrics_file: str = METRICS_FILE, summary_file: str = SUMMARY_FILE):
+        # Called at the end of a run; both files are replaced atomically so a
+        # collector never reads a half-written one
+        self.runs += 1
+        written = []
+        for path, text in ((metrics_file, self.prometheus), (summary_file, lambda: json.dumps(self.summary(), indent=2))):
+            if not path:
+                continue
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text())
+            os.replace(tmp_path, path)
+            written.append(path)
+        self.report()
+        if written:
+            print(f"Metrics written to {' and '.join(written)}")
+
+    def report(self):
+        print("Stage timings (count, mean, p50, p95, max):")
+        for key, s in self.summary()["stages"].items():
+            print(f"  {key}: {s['count']}, {s['mean_s']:.2f}s, {s['p50_s']:.2f}s, {s['p95_s']:.2f}s, {s['max_s']:.2f}s")
+        totals = defaultdict(int)
+        for (_, outcome), n in self.routes.items():
+            totals[outcome] += n
+        print("Searches: " + ", ".join(f"{totals[o]} {o}" for o in OUTCOMES if totals[o]))
+
+
+# One registry per process, shared by the scraper and the writer
+METRICS = Metrics()
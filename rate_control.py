@@ -0,0 +1,59 @@
+import asyncio
+import os
+import random
+import time
+
+# Retry policy for failed searches
+MAX_ATTEMPTS = int(os.environ.get("SCRAPER_MAX_ATTEMPTS", "4"))
+BACKOFF_BASE = 5.0  # seconds
+BACKOFF_CAP = 120.0  # seconds
+
+
+def backoff_delay(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    # Exponential backoff with full jitter: attempt 1 waits up to base, attempt 2 up to 2*base, ...
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class AdaptiveLimiter:
+    # AIMD cap on searches in flight across all browsers: every success raises the
+    # limit by about one per window of searches, a timeout or block page halves it
+    # (at most once per cooldown so one burst of failures only counts once)
+    def __init__(self, maximum: int, minimum: int = 1, increase: float = 1.0,
+                 decrease: float = 0.5, cooldown: float = 10.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.successes = 0
+        self.congestions = 0
+        self._last_decrease = float("-inf")
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.successes += 1
+        self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def on_congestion(self):
+        self.congestions += 1
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = int(self.limit)
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        if int(self.limit) != old:
+            print(f"Throttling detected, concurrent searches {old} -> {int(self.limit)}")
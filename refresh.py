@@ -0,0 +1,115 @@
+import asyncio
+import math
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from result_store import DB_FILE, ResultStore
+from scraper import NUM_WORKERS, TABS_PER_BROWSER, price_value, run_jobs
+
+# Re-scrapes rows that already exist, most valuable first, under a fixed page budget.
+# A key's priority is roughly how far its price has probably moved since it was scraped:
+#   route volatility * sqrt(days since scrape) * near-departure weight
+# Volatility is the typical |log price change| per sqrt(day) between two scrapes of the
+# same key, from the store's price_history, pulled toward DEFAULT_VOLATILITY while a
+# route has few observations.
+CSV_FILE = "best_flight_prices.csv"
+REFRESH_LOG = "refreshed_prices.csv"  # every refreshed row, in scrape order
+REFRESH_BUDGET = int(os.environ.get("SCRAPER_REFRESH_BUDGET", "100"))  # pages per run
+MIN_AGE_HOURS = 6  # never re-scrape a key younger than this
+MAX_AGE_DAYS = 60  # older scrapes (or unknown times) all count as this old
+NEAR_DEPARTURE_DAYS = 14  # a fare this many days out gets half the weight of one departing today
+DEFAULT_VOLATILITY = 0.03
+PRIOR_WEIGHT = 5  # observations DEFAULT_VOLATILITY is worth
+
+
+def _parse_time(text: str) -> datetime:
+    return datetime.strptime(text, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def route_volatility(history) -> Dict[Tuple[str, str], float]:
+    # history: (from, to, date, price, scraped_at) rows sorted by key then scrape time
+    total = defaultdict(float)
+    count = defaultdict(int)
+    previous = None
+    for from_airport, to_airport, date, price, scraped_at in history:
+        value = price_value(price)
+        current = ((from_airport, to_airport, date), value, _parse_time(scraped_at))
+        if previous and previous[0] == current[0] and math.isfinite(value) and math.isfinite(previous[1]):
+            days = (current[2] - previous[2]).total_seconds() / 86400
+            if days > 0 and value > 0 and previous[1] > 0:
+                total[current[0][:2]] += abs(math.log(value / previous[1])) / math.sqrt(days)
+                count[current[0][:2]] += 1
+        previous = current
+    return {
+        route: (total[route] + PRIOR_WEIGHT * DEFAULT_VOLATILITY) / (count[route] + PRIOR_WEIGHT)
+        for route in count
+    }
+
+
+def refresh_priorities(store: ResultStore, now: datetime = None) -> List[Tuple[float, Tuple[str, str, str]]]:
+    # (score, job) for every key that departs today or later and is old enough, best first
+    now = now or datetime.now(timezone.utc)
+    today = now.strftime("%Y-%m-%d")
+    volatility = route_volatility(store.history())
+    scored = []
+    for from_airport, to_airport, date, price, scraped_at in store.scrape_times(today):
+        try:
+            age_days = (now - _parse_time(scraped_at)).total_seconds() / 86400
+        except (TypeError, ValueError):
+            age_days = MAX_AGE_DAYS
+        if age_days * 24 < MIN_AGE_HOURS:
+            continue
+        days_out = (datetime.strptime(date, "%Y-%m-%d").date() - now.date()).days
+        urgency = 1 / (1 + days_out / NEAR_DEPARTURE_DAYS)
+        route_vol = volatility.get((from_airport, to_airport), DEFAULT_VOLATILITY)
+        score = route_vol * math.sqrt(min(age_days, MAX_AGE_DAYS)) * urgency
+        scored.append((score, (from_airport, to_airport, date)))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return scored
+
+
+def export_store(store: ResultStore, csv_file: str = CSV_FILE) -> int:
+    # Rewrites csv_file from the store (one row per key, newest scrape), atomically
+    tmp_file = csv_file + ".tmp"
+    rows = store.export_csv(tmp_file)
+    os.replace(tmp_file, csv_file)
+    return rows
+
+
+async def main(budget: int = REFRESH_BUDGET, export: bool = False):
+    store = ResultStore(DB_FILE)
+    if os.path.exists(CSV_FILE):
+        # Rows only in the CSV have no scrape time (the file's mtime is just its last
+        # append), so they are stored with none and count as MAX_AGE_DAYS old
+        added = store.import_csv(CSV_FILE, unknown_time=True)
+        if added:
+            print(f"Imported {added} rows from {CSV_FILE} into {DB_FILE}")
+    scored = refresh_priorities(store)
+    store.close()
+
+    jobs = [job for _, job in scored[:budget]]
+    if not jobs:
+        print("Nothing is due for a refresh.")
+        return
+    print(f"{len(scored)} rows can be refreshed; scraping the top {len(jobs)} "
+          f"(scores {scored[0][0]:.3f} to {scored[len(jobs) - 1][0]:.3f})")
+
+    # No cache and no journal: a refresh has to go to the site, and the journal
+    # already marks these keys as done
+    await run_jobs(jobs, REFRESH_LOG, NUM_WORKERS, TABS_PER_BROWSER, db_file=DB_FILE)
+
+    if export:
+        # Replaces the raw, append-only CSV (and its duplicate rows) with the store's
+        # one newest row per key; off by default, the refreshed rows are in REFRESH_LOG
+        store = ResultStore(DB_FILE)
+        print(f"Rewrote {CSV_FILE} from {DB_FILE} with the refreshed prices ({export_store(store)} rows)")
+        store.close()
+
+
+if __name__ == "__main__":
+    # python refresh.py [budget] [--export]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    asyncio.run(main(int(args[0]) if args else REFRESH_BUDGET, export="--export" in sys.argv))
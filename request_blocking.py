@@ -0,0 +1,75 @@
+import os
+import re
+from collections import Counter
+
+# Resource types that are never needed to read prices
+BLOCKED_RESOURCE_TYPES = {
+    t.strip() for t in os.environ.get("SCRAPER_BLOCK_TYPES", "image,media,font").split(",") if t.strip()
+}
+
+# Analytics beacons, ads and map tiles
+BLOCKED_URL_PATTERNS = [
+    r"google-analytics\.com",
+    r"googletagmanager\.com",
+    r"doubleclick\.net",
+    r"googleadservices\.com",
+    r"/gen_204",
+    r"/log\?format=json",
+    r"/maps/vt",
+    r"maps\.googleapis\.com",
+    r"\.(png|jpe?g|gif|webp|svg|ico|woff2?|ttf|mp4)(\?|$)",
+]
+
+# Rough transfer size of one blocked request, used to estimate the bytes saved
+TYPICAL_BYTES = {
+    "image": 20_000,
+    "media": 200_000,
+    "font": 40_000,
+    "stylesheet": 15_000,
+    "script": 50_000,
+}
+DEFAULT_TYPICAL_BYTES = 2_000
+
+
+class ResourceBlocker:
+    # Aborts heavy requests on a browser context and counts what it saved.
+    # One instance can be installed on several contexts to get run totals.
+    def __init__(self, resource_types=None, url_patterns=None):
+        self.resource_types = set(BLOCKED_RESOURCE_TYPES if resource_types is None else resource_types)
+        patterns = BLOCKED_URL_PATTERNS if url_patterns is None else url_patterns
+        self.url_pattern = re.compile("|".join(patterns)) if patterns else None
+        self.blocked = Counter()
+        self.bytes_saved = 0
+        self.allowed = 0
+        self.bytes_loaded = 0
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        return bool(self.url_pattern and self.url_pattern.search(url))
+
+    async def install(self, context):
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    async def _handle(self, route):
+        request = route.request
+        if self.should_block(request.resource_type, request.url):
+            self.blocked[request.resource_type] += 1
+            self.bytes_saved += TYPICAL_BYTES.get(request.resource_type, DEFAULT_TYPICAL_BYTES)
+            await route.abort()
+        else:
+            self.allowed += 1
+            await route.continue_()
+
+    def _on_response(self, response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.bytes_loaded += int(length)
+
+    def report(self):
+        total_blocked = sum(self.blocked.values())
+        print(f"Blocked {total_blocked} requests (~{self.bytes_saved / 1_000_000:.1f} MB saved), "
+              f"allowed {self.allowed} requests ({self.bytes_loaded / 1_000_000:.1f} MB loaded)")
+        for resource_type, count in self.blocked.most_common():
+            print(f"  {resource_type}: {count} blocked")
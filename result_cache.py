@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+CACHE_FILE = "search_cache.db"
+CACHE_TTL = float(os.environ.get("SCRAPER_CACHE_TTL", str(6 * 3600)))  # seconds
+CACHE_MAX_ENTRIES = int(os.environ.get("SCRAPER_CACHE_MAX", "20000"))
+
+
+class ResultCache:
+    # Persistent URL -> best flight cache with a TTL and LRU eviction.
+    # Only successful results are stored; misses always go to the site.
+    def __init__(self, path: str = CACHE_FILE, ttl: float = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "url TEXT PRIMARY KEY, result TEXT NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_used_at ON cache (used_at)")
+        self.conn.commit()
+        self.size = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Dict]:
+        now = time.time()
+        row = self.conn.execute("SELECT result, stored_at FROM cache WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        result, stored_at = row
+        if now - stored_at > self.ttl:
+            with self.conn:
+                self.conn.execute("DELETE FROM cache WHERE url = ?", (url,))
+            self.size -= 1
+            self.expired += 1
+            self.misses += 1
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE cache SET used_at = ? WHERE url = ?", (now, url))
+        self.hits += 1
+        # When the search really ran, so the store does not take a replayed row for a new scrape
+        best = json.loads(result)
+        best["Scraped At"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(stored_at))
+        return best
+
+    def put(self, url: str, result: Dict):
+        now = time.time()
+        with self.conn:
+            updated = self.conn.execute(
+                "UPDATE cache SET result = ?, stored_at = ?, used_at = ? WHERE url = ?",
+                (json.dumps(result), now, now, url),
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO cache (url, result, stored_at, used_at) VALUES (?, ?, ?, ?)",
+                    (url, json.dumps(result), now, now),
+                )
+                self.size += 1
+            self._evict()
+
+    def _evict(self):
+        # Drop the least recently used entries beyond max_entries
+        extra = self.size - self.max_entries
+        if extra > 0:
+            self.conn.execute(
+                "DELETE FROM cache WHERE url IN (SELECT url FROM cache ORDER BY used_at LIMIT ?)", (extra,)
+            )
+            self.size -= extra
+            self.evicted += extra
+
+    def __len__(self) -> int:
+        return self.size
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups else 0
+        print(f"Cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+              f"{self.expired} expired, {self.evicted} evicted, {len(self)} entries")
+
+    def close(self):
+        self.conn.close()
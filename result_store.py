@@ -0,0 +1,153 @@
+import csv
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from result_writer import CSV_COLUMNS
+
+DB_FILE = "best_flight_prices.db"
+
+# CSV column -> SQLite column
+COLUMN_MAP = [
+    ("From", "from_airport"),
+    ("To", "to_airport"),
+    ("Date", "date"),
+    ("Departure Time", "departure_time"),
+    ("Arrival Time", "arrival_time"),
+    ("Airline Company", "airline"),
+    ("Flight Duration", "duration"),
+    ("Stops", "stops"),
+    ("Price", "price"),
+    ("co2 emissions", "co2"),
+    ("emissions variation", "emissions_variation"),
+]
+DB_COLUMNS = [db for _, db in COLUMN_MAP]
+KEY_COLUMNS = ["from_airport", "to_airport", "date"]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ResultStore:
+    # Best price per (From, To, Date); a newer scrape of the same key replaces the old one.
+    # Has the same write_batch/close interface as CsvSink so ResultWriter can feed it.
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ", ".join(f"{c} TEXT" for c in DB_COLUMNS)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS flights ({columns}, scraped_at TEXT, "
+            f"PRIMARY KEY ({', '.join(KEY_COLUMNS)})) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS flights_date ON flights (date)")
+        # Every scraped price, so refreshes can see how much a route's fares move over time
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_history ("
+            "from_airport TEXT, to_airport TEXT, date TEXT, price TEXT, scraped_at TEXT)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS price_history_key ON price_history (from_airport, to_airport, date)"
+        )
+        self.conn.commit()
+
+    def _values(self, row: Dict, scraped_at: str) -> Tuple:
+        return tuple(row.get(name) for name, _ in COLUMN_MAP) + (row.get("Scraped At") or scraped_at,)
+
+    def _scraped_at(self, key: Tuple) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT scraped_at FROM flights WHERE from_airport = ? AND to_airport = ? AND date = ?", key
+        ).fetchone()
+        return row[0] if row else None
+
+    def upsert_many(self, rows: Iterable[Dict]) -> int:
+        # Rows carrying a "Scraped At" (cache hits, merged shards) keep that time. A row
+        # no newer than what the store holds for its key (a cached copy of a search
+        # already stored) changes nothing and adds no price_history point.
+        scraped_at = _now()
+        values = [self._values(row, scraped_at) for row in rows]
+        placeholders = ", ".join("?" for _ in range(len(DB_COLUMNS) + 1))
+        updates = ", ".join(f"{c} = excluded.{c}" for c in DB_COLUMNS + ["scraped_at"] if c not in KEY_COLUMNS)
+        with self.conn:
+            current = {v[:3]: self._scraped_at(v[:3]) for v in values}
+            values = [v for v in values if current[v[:3]] is None or (v[-1] or "") > current[v[:3]]]
+            self.conn.executemany(
+                f"INSERT INTO flights ({', '.join(DB_COLUMNS)}, scraped_at) VALUES ({placeholders}) "
+                f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates}",
+                values,
+            )
+            self.conn.executemany(
+                "INSERT INTO price_history (from_airport, to_airport, date, price, scraped_at) VALUES (?, ?, ?, ?, ?)",
+                [v[:3] + (v[DB_COLUMNS.index("price")], v[-1]) for v in values],
+            )
+        return len(values)
+
+    def write_batch(self, rows: List[Dict]):
+        self.upsert_many(rows)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM flights").fetchone()[0]
+
+    def scrape_times(self, start_date: str = None) -> List[Tuple[str, str, str, str, str]]:
+        # (from, to, date, price, scraped_at) of every key departing on or after start_date
+        return self.conn.execute(
+            "SELECT from_airport, to_airport, date, price, scraped_at FROM flights WHERE date >= ?",
+            (start_date or "",),
+        ).fetchall()
+
+    def history(self) -> List[Tuple[str, str, str, str, str]]:
+        # (from, to, date, price, scraped_at) of every scrape, oldest first per key
+        return self.conn.execute(
+            "SELECT from_airport, to_airport, date, price, scraped_at FROM price_history "
+            "ORDER BY from_airport, to_airport, date, scraped_at"
+        ).fetchall()
+
+    def import_csv(self, csv_file: str, scraped_at: str = None, unknown_time: bool = False) -> int:
+        # Seeds the store from an existing CSV; like clean_data, the first row of a key wins.
+        # scraped_at is recorded for the imported rows (default: now); with unknown_time
+        # it is left NULL, for rows whose scrape time the CSV does not tell
+        placeholders = ", ".join("?" for _ in range(len(DB_COLUMNS) + 1))
+        scraped_at = None if unknown_time else scraped_at or _now()
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            values = [self._values(row, scraped_at) for row in csv.DictReader(f)
+                      if row.get("From") and row.get("To") and row.get("Date")]
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO flights ({', '.join(DB_COLUMNS)}, scraped_at) VALUES ({placeholders})",
+                values,
+            )
+            return self.conn.total_changes - before
+
+    def export_csv(self, csv_file: str) -> int:
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(DB_COLUMNS)} FROM flights ORDER BY from_airport, to_airport, date"
+        )
+        count = 0
+        with open(csv_file, "w", newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for row in cursor:
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    # python result_store.py import|export [csv_file] [db_file]
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    csv_file = sys.argv[2] if len(sys.argv) > 2 else "best_flight_prices.csv"
+    store = ResultStore(sys.argv[3] if len(sys.argv) > 3 else DB_FILE)
+    if command == "import":
+        print(f"Imported {store.import_csv(csv_file)} new rows from {csv_file} into {store.path}")
+    elif command == "export":
+        print(f"Exported {store.export_csv(csv_file)} rows from {store.path} to {csv_file}")
+    else:
+        print(f"Unknown command: {command}")
+    store.close()
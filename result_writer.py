@@ -0,0 +1,114 @@
+import asyncio
+import csv
+import os
+from typing import Dict, List
+
+from metrics import METRICS
+
+# Column order of best_flight_prices.csv
+CSV_COLUMNS = [
+    "From", "To", "Date",
+    "Departure Time", "Arrival Time", "Airline Company",
+    "Flight Duration", "Stops", "Price", "co2 emissions", "emissions variation",
+]
+
+BATCH_SIZE = 50
+FLUSH_INTERVAL = 5.0  # seconds
+
+
+class CsvSink:
+    # Keeps the CSV open for the whole run; the columns are fixed when it is opened
+    def __init__(self, path: str, columns: List[str] = None):
+        self.path = path
+        self.columns = columns or self._existing_columns(path) or CSV_COLUMNS
+        is_new = not os.path.exists(path) or os.stat(path).st_size == 0
+        self.file = open(path, "a", newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction="ignore")
+        if is_new:
+            self.writer.writeheader()
+
+    @staticmethod
+    def _existing_columns(path: str):
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                return next(csv.reader(f), None)
+        except FileNotFoundError:
+            return None
+
+    def write_batch(self, rows: List[Dict]):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+class ResultWriter:
+    # Single task that owns every sink; producers only put rows on its queue.
+    # Rows are flushed every `batch_size` rows or `flush_interval` seconds.
+    def __init__(self, sinks, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.batches = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def put(self, row: Dict):
+        self._queue.put_nowait(row)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                self._flush(batch)
+                batch, deadline = [], None
+                continue
+            if row is None:
+                break
+            batch.append(row)
+            if deadline is None:
+                deadline = loop.time() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch, deadline = [], None
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[Dict]):
+        # Sinks are written in order; after a failure the later ones are skipped so
+        # nothing downstream (e.g. the resume journal) records rows that were not written
+        for sink in self.sinks:
+            name = type(sink).__name__
+            try:
+                with METRICS.stage("write", sink=name):
+                    sink.write_batch(batch)
+                METRICS.written(name, len(batch))
+            except Exception as e:
+                print(f"Error writing {len(batch)} rows to {name}: {e}")
+                break
+        self.rows_written += len(batch)
+        self.batches += 1
+
+    async def close(self):
+        # Flush what is left, then fsync and close every sink
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+        for sink in self.sinks:
+            with METRICS.stage("close", sink=type(sink).__name__):
+                sink.close()
+        print(f"Wrote {self.rows_written} rows in {self.batches} batches")
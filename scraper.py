@@ -1,10 +1,26 @@
 import asyncio
 from datetime import datetime, timedelta
-import csv
+import hashlib
 import os
-from typing import List, Dict
+import re
+import time
+from typing import List, Dict, Tuple
 from flight_scraper import FlightURLBuilder, setup_browser, scrape_flight_info
+from request_blocking import ResourceBlocker
+from result_writer import CsvSink, ResultWriter
+from result_store import DB_FILE, ResultStore
+from checkpoint import EMPTY, FAILED, JOURNAL_FILE, Journal
+from result_cache import ResultCache
+from rate_control import AdaptiveLimiter, MAX_ATTEMPTS, backoff_delay
+from metrics import METRICS
+from shopping_results import parse_shopping_results
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+try:
+    from playwright._impl._errors import TargetClosedError
+except ImportError:  # older Playwright raises a plain Error when the target is gone
+    TargetClosedError = None
 from asyncio import Semaphore
+from contextlib import asynccontextmanager
 
 # List of 10 countries (main airports) to/from Taiwan (TPE)
 COUNTRIES = [
@@ -22,6 +38,14 @@ COUNTRIES = [
 
 TAIWAN = "TPE"  # Taipei Taoyuan
 
+# Number of browsers draining the shared job queue
+NUM_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "3"))
+# Number of tabs each browser keeps searching concurrently
+TABS_PER_BROWSER = int(os.environ.get("SCRAPER_TABS", "3"))
+# Times a browser that crashed or disconnected is replaced before its worker gives
+# up; the count starts over whenever a replacement completes a search
+BROWSER_RESTARTS = int(os.environ.get("SCRAPER_BROWSER_RESTARTS", "3"))
+
 # Date range: June 1st to August 31st (every day)
 def generate_daily_dates(start_year: int, start_month: int, end_year: int, end_month: int) -> list:
     dates = []
@@ -38,81 +62,474 @@ def generate_daily_dates(start_year: int, start_month: int, end_year: int, end_m
         current += timedelta(days=1)
     return dates
 
-# Fix: get_best_price should accept a page and url
-async def get_best_price(page, url: str) -> Dict:
+# How get_best_price reads the results: "dom" walks the cards with
+# scrape_flight_info, "evaluate" pulls every card in one page.evaluate call
+# using CARD_FIELDS, "network" (experimental, see shopping_results.py) parses
+# the results payload the page fetches and falls back to "dom". "evaluate" is
+# faster but opt-in until its output is checked against scrape_flight_info
+# on live pages
+EXTRACT_MODE = os.environ.get("SCRAPER_EXTRACT", "dom")
+# If set, every captured results payload is saved here so it can be replayed offline
+RECORD_DIR = os.environ.get("SCRAPER_RECORD_DIR")
+
+# CSS selectors for the fields of one .pIav2d card, copied by hand to give the
+# same fields as scrape_flight_info; keep them in step when its selectors change
+CARD_FIELDS = {
+    "Departure Time": 'span[aria-label^="Departure time"]',
+    "Arrival Time": 'span[aria-label^="Arrival time"]',
+    "Airline Company": ".sSHqwe.tPgKwe.ogfYpf",
+    "Flight Duration": "div.gvkrdb.AdWm1c.tPgKwe.ogfYpf",
+    "Stops": "div.EfT7Ae.AdWm1c.tPgKwe span.ogfYpf",
+    "Price": "div.FpEdX span",
+    "co2 emissions": "div.O7CXue",
+    "emissions variation": "div.N6PNV",
+}
+
+EXTRACT_CARDS_JS = """
+([cardSelector, fields, cheapestOnly]) => {
+    const cards = Array.from(document.querySelectorAll(cardSelector));
+    const flights = cards.map(card => {
+        const info = {};
+        for (const [name, selector] of Object.entries(fields)) {
+            const el = card.querySelector(selector);
+            info[name] = el ? el.innerText.trim() : "N/A";
+        }
+        return info;
+    });
+    if (!cheapestOnly) {
+        return {count: cards.length, flights: flights};
+    }
+    let best = null;
+    let bestPrice = Infinity;
+    for (const info of flights) {
+        const digits = info["Price"].replace(/[^0-9.]/g, "");
+        const price = digits ? parseFloat(digits) : Infinity;
+        if (best === null || price < bestPrice) {
+            best = info;
+            bestPrice = price;
+        }
+    }
+    return {count: cards.length, flights: best ? [best] : []};
+}
+"""
+
+def price_value(price_str) -> float:
+    # "NT$3,670" -> 3670.0, anything unparsable sorts last
+    digits = re.sub(r'[^\d.]', '', price_str or "")
+    try:
+        return float(digits) if digits else float('inf')
+    except ValueError:
+        return float('inf')
+
+def cheapest_flight(flights: List[Dict]):
     best = None
+    for info in flights:
+        price = price_value(info.get("Price", "N/A"))
+        if best is None or price < best["price"]:
+            best = {"info": info, "price": price}
+    return best["info"] if best else None
+
+# Google Flights shows this instead of result cards when nothing flies that day
+NO_RESULTS_TEXT = re.compile(r"No results returned|No flights found", re.IGNORECASE)
+
+async def wait_for_results(page, timeout: float = 40000):
+    # Returns as soon as either the first result card or the no-results message is
+    # shown, so a day without flights is an empty result rather than a 40s timeout
+    cards = page.locator(".pIav2d")
+    await cards.or_(page.get_by_text(NO_RESULTS_TEXT)).first.wait_for(timeout=timeout)
+
+async def extract_flights_in_page(page, cheapest_only: bool = True) -> Dict:
+    # One IPC round trip for every card on the page
+    return await page.evaluate(EXTRACT_CARDS_JS, [".pIav2d", CARD_FIELDS, cheapest_only])
+
+async def extract_flights_dom(page) -> Dict:
+    flights = await page.query_selector_all(".pIav2d")
+    infos = [await scrape_flight_info(flight) for flight in flights]
+    return {"count": len(flights), "flights": infos}
+
+RESULTS_ENDPOINT = "GetShoppingResults"
+
+def is_results_response(response) -> bool:
+    return RESULTS_ENDPOINT in response.url and response.ok
+
+def record_response(url: str, body: str):
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    with open(os.path.join(RECORD_DIR, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(body)
+
+async def capture_flights_from_network(page, url: str):
+    # Navigates to url and returns the parsed flights as soon as the results
+    # payload arrives, or None if it never shows up (the caller then reads the DOM)
+    response_task = asyncio.ensure_future(
+        page.wait_for_event("response", predicate=is_results_response, timeout=40000)
+    )
     try:
-        print(f"Visiting: {url}")
-        await page.goto(url, timeout=60000)
-        await page.wait_for_selector(".pIav2d", timeout=40000)
-        flights = await page.query_selector_all(".pIav2d")
-        print(f"Found {len(flights)} flights for {url}")
-        for flight in flights:
-            info = await scrape_flight_info(flight)
-            price_str = info.get("Price", "N/A").replace("$", "").replace(",", "").strip()
-            try:
-                price = float(price_str) if price_str != "N/A" else float('inf')
-            except Exception:
-                price = float('inf')
-            if best is None or price < best["price"]:
-                best = {"info": info, "price": price}
+        check_blocked(page, await page.goto(url, timeout=60000, wait_until="commit"))
+    except Exception:
+        response_task.cancel()
+        raise
+    try:
+        body = await (await response_task).text()
     except Exception as e:
-        print(f"Error scraping {url}: {e}")
+        print(f"No results payload for {url}: {e}")
+        return None
+    if RECORD_DIR:
+        record_response(url, body)
+    flights = parse_shopping_results(body)
+    return {"count": len(flights), "flights": flights} if flights else None
+
+class BlockedPageError(Exception):
+    pass
+
+def check_blocked(page, response):
+    # Google answers throttled clients with HTTP 429 or a redirect to /sorry/
+    if (response is not None and response.status == 429) or "/sorry/" in page.url:
+        raise BlockedPageError(f"Blocked by the remote site ({page.url})")
+
+class BrowserLostError(Exception):
+    pass
+
+def browser_lost(error: Exception, browser) -> bool:
+    # A crashed or closed browser fails every search on it at once, so those
+    # failures say nothing about the search or the site
+    if TargetClosedError is not None and isinstance(error, TargetClosedError):
+        return True
+    return not browser.is_connected()
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, BlockedPageError):
+        return "blocked"
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    return "error"
+
+async def search_best_price(page, url: str, mode: str = EXTRACT_MODE) -> Dict:
+    # Same as get_best_price but lets timeouts and block pages propagate
+    print(f"Visiting: {url}")
+    result = None
+    if mode == "network":
+        with METRICS.stage("network"):
+            result = await capture_flights_from_network(page, url)
+    else:
+        with METRICS.stage("goto"):
+            response = await page.goto(url, timeout=60000)
+        check_blocked(page, response)
+    if result is None:
+        with METRICS.stage("wait"):
+            await wait_for_results(page)
+        with METRICS.stage("extract", mode=mode):
+            if mode == "evaluate":
+                result = await extract_flights_in_page(page)
+            else:
+                result = await extract_flights_dom(page)
+    print(f"Found {result['count']} flights for {url}")
+    best = cheapest_flight(result["flights"])
     if not best:
         print(f"No valid flights found for {url}")
-    return best["info"] if best else None
+    return best
+
+async def get_best_price(page, url: str, mode: str = EXTRACT_MODE) -> Dict:
+    try:
+        return await search_best_price(page, url, mode)
+    except Exception as e:
+        print(f"Error scraping {url}: {e}")
+        print(f"No valid flights found for {url}")
+        return None
+
+class PagePool:
+    # Several tabs of one browser; at most `size` searches run at once
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.semaphore = Semaphore(len(self.pages))
+        self._free = asyncio.Queue()
+        for page in self.pages:
+            self._free.put_nowait(page)
 
-async def get_best_price_with_semaphore(url: str, semaphore: Semaphore):
-    async with semaphore:
-        return await get_best_price(url)
+    @classmethod
+    async def create(cls, page, size: int):
+        # Reuse the page from setup_browser so its context (proxy, headers) is shared by every tab
+        pages = [page]
+        for _ in range(size - 1):
+            pages.append(await page.context.new_page())
+        return cls(pages)
+
+    @asynccontextmanager
+    async def page(self):
+        async with self.semaphore:
+            page = await self._free.get()
+            try:
+                yield page
+            finally:
+                self._free.put_nowait(page)
+
+    async def close(self):
+        for page in self.pages[1:]:
+            try:
+                await page.close()
+            except Exception as e:
+                print(f"Error closing tab: {e}")
+
+async def get_best_price_with_semaphore(url: str, pool: PagePool, raise_errors: bool = False):
+    async with pool.page() as page:
+        if raise_errors:
+            return await search_best_price(page, url)
+        return await get_best_price(page, url)
+
+def build_jobs(dates) -> List[Tuple[str, str, str]]:
+    jobs = []
+    for country_code, airport in COUNTRIES:
+        for direction in [(airport, TAIWAN), (TAIWAN, airport)]:
+            for date in dates:
+                jobs.append((direction[0], direction[1], date))
+    return jobs
+
+class ScrapeRun:
+    # State shared by every browser and tab of one run
+    def __init__(self, jobs, writer, limiter, blocker=None, journal=None, cache=None):
+        self.queue = asyncio.Queue()
+        for job in jobs:
+            self.queue.put_nowait(job)
+        self.writer = writer
+        self.limiter = limiter
+        self.blocker = blocker
+        self.journal = journal
+        self.cache = cache
+        self.stats = {}
+        self.attempts = {}
+        self.failed = []
+        self.retry_tasks = set()
+
+    def retry_later(self, job, delay):
+        # The original job stays unfinished until the retry is queued, so queue.join() waits for it
+        async def requeue():
+            await asyncio.sleep(delay)
+            self.queue.put_nowait(job)
+            self.queue.task_done()
+        task = asyncio.create_task(requeue())
+        self.retry_tasks.add(task)
+        task.add_done_callback(self.retry_tasks.discard)
+
+    def record(self, status, job):
+        if self.journal:
+            self.journal.record(status, [job])
+
+async def tab_worker(worker_id, pool, run, worker_stats, browser):
+    while True:
+        job = await run.queue.get()
+        from_airport, to_airport, date = job
+        retrying = False
+        try:
+            url = FlightURLBuilder.build_url(from_airport, to_airport, date)
+            try:
+                async with run.limiter:
+                    best = await get_best_price_with_semaphore(url, pool, raise_errors=True)
+            except asyncio.CancelledError:
+                # A sibling tab lost the browser or the run is over; the job goes back for another tab
+                run.queue.put_nowait(job)
+                raise
+            except Exception as e:
+                if browser_lost(e, browser):
+                    # Not the job's fault: back on the queue without using up an attempt
+                    run.queue.put_nowait(job)
+                    raise BrowserLostError(f"browser lost during {from_airport} -> {to_airport} on {date}: {e}") from e
+                kind = classify_error(e)
+                worker_stats[kind] = worker_stats.get(kind, 0) + 1
+                METRICS.search(from_airport, to_airport, worker_id, kind)
+                if kind in ("timeout", "blocked"):
+                    run.limiter.on_congestion()
+                attempts = run.attempts[job] = run.attempts.get(job, 0) + 1
+                if attempts < MAX_ATTEMPTS:
+                    delay = backoff_delay(attempts)
+                    print(f"[worker {worker_id}] {kind} for {from_airport} -> {to_airport} on {date} "
+                          f"(attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                    run.retry_later(job, delay)
+                    retrying = True
+                else:
+                    print(f"[worker {worker_id}] Giving up on {from_airport} -> {to_airport} on {date} "
+                          f"after {attempts} attempts: {e}")
+                    run.failed.append(job)
+                    run.record(FAILED, job)
+                continue
+            run.limiter.on_success()
+            worker_stats["pages"] += 1
+            METRICS.search(from_airport, to_airport, worker_id, "success" if best else "empty")
+            if best and run.cache is not None:
+                run.cache.put(url, dict(best))
+            if best:
+                best["From"] = from_airport
+                best["To"] = to_airport
+                best["Date"] = date
+                run.writer.put(best)
+                worker_stats["found"] += 1
+                print(f"[worker {worker_id}] Queued for CSV: {from_airport} -> {to_airport} on {date}")
+            else:
+                run.record(EMPTY, job)
+                print(f"[worker {worker_id}] No best price found for {from_airport} -> {to_airport} on {date}")
+        finally:
+            worker_stats["elapsed"] = time.monotonic() - worker_stats["started"]
+            if not retrying:
+                run.queue.task_done()
 
-async def process_month(month_dates, month_name, csv_file, write_header):
+async def launch_browser(blocker=None):
+    # setup_browser with the request blocker installed on its context, so every
+    # script that opens a browser loads pages the same way the scraper does
     p, browser, page = await setup_browser()
-    keys = None
+    if blocker is not None:
+        try:
+            await blocker.install(page.context)
+        except Exception:
+            await browser.close()
+            await p.stop()
+            raise
+    return p, browser, page
+
+async def run_browser(worker_id, run, tabs, worker_stats):
+    # One browser and its tabs until a tab fails; the other tabs are cancelled
+    # (their jobs go back on the queue) before the browser is closed under them
+    p, browser, page = await launch_browser(run.blocker)
+    try:
+        pool = await PagePool.create(page, tabs)
+        tasks = [asyncio.create_task(tab_worker(worker_id, pool, run, worker_stats, browser)) for _ in range(tabs)]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await pool.close()
+        for task in done:
+            task.result()
+    finally:
+        try:
+            await browser.close()
+            await p.stop()
+        except Exception as e:
+            print(f"[worker {worker_id}] Error closing browser: {e}")
+
+async def browser_worker(worker_id, run, tabs=TABS_PER_BROWSER):
+    worker_stats = run.stats.setdefault(worker_id, {"pages": 0, "found": 0, "elapsed": 0.0})
+    worker_stats["started"] = time.monotonic()
+    restarts = 0
+    while True:
+        pages = worker_stats["pages"]
+        try:
+            await run_browser(worker_id, run, tabs, worker_stats)
+        except BrowserLostError as e:
+            restarts = 1 if worker_stats["pages"] > pages else restarts + 1
+            if restarts > BROWSER_RESTARTS:
+                print(f"[worker {worker_id}] {e}; giving up after {BROWSER_RESTARTS} restarts")
+                raise
+            print(f"[worker {worker_id}] {e}; starting a new browser ({restarts}/{BROWSER_RESTARTS})")
+
+def serve_from_cache(jobs, cache, writer):
+    # Writes every job with a fresh cache entry straight to the writer; returns the rest
+    remaining = []
+    for from_airport, to_airport, date in jobs:
+        best = cache.get(FlightURLBuilder.build_url(from_airport, to_airport, date))
+        if best:
+            best.update({"From": from_airport, "To": to_airport, "Date": date})
+            writer.put(best)
+            METRICS.search(from_airport, to_airport, "cache", "cached")
+        else:
+            remaining.append((from_airport, to_airport, date))
+    return remaining
+
+async def run_jobs(jobs, csv_file, num_workers=NUM_WORKERS, tabs=TABS_PER_BROWSER, block_resources=True,
+                   db_file=DB_FILE, journal=None, cache=None):
+    sinks = [CsvSink(csv_file)] + ([ResultStore(db_file)] if db_file else [])
+    if journal:
+        sinks.append(journal)  # last, so a job is journaled only once its row is written
+    writer = ResultWriter(sinks).start()
+    if cache is not None:
+        cached = len(jobs)
+        jobs = serve_from_cache(jobs, cache, writer)
+        print(f"Served {cached - len(jobs)} searches from the cache, {len(jobs)} left to scrape")
+    run = ScrapeRun(
+        jobs,
+        writer=writer,
+        limiter=AdaptiveLimiter(maximum=max(1, num_workers * tabs)),
+        blocker=ResourceBlocker() if block_resources else None,
+        journal=journal,
+        cache=cache,
+    )
+    started = time.monotonic()
+    workers = [
+        asyncio.create_task(browser_worker(worker_id, run, tabs))
+        for worker_id in range(min(num_workers, len(jobs)))
+    ]
+    join_task = asyncio.create_task(run.queue.join())
     try:
-        for country_code, airport in COUNTRIES:
-            for direction in [(airport, TAIWAN), (TAIWAN, airport)]:
-                for date in month_dates:
-                    url = FlightURLBuilder.build_url(direction[0], direction[1], date)
-                    best = await get_best_price(page, url)
-                    if best:
-                        best["From"] = direction[0]
-                        best["To"] = direction[1]
-                        best["Date"] = date
-                        if keys is None:
-                            keys = ["From", "To", "Date"] + [k for k in best if k not in ("From", "To", "Date")]
-                        with open(csv_file, "a", newline='', encoding='utf-8') as f:
-                            writer = csv.DictWriter(f, fieldnames=keys)
-                            if write_header[0]:
-                                writer.writeheader()
-                                write_header[0] = False
-                            writer.writerow(best)
-                        print(f"Written to CSV: {direction[0]} -> {direction[1]} on {date}")
-                    else:
-                        print(f"No best price found for {direction[0]} -> {direction[1]} on {date}")
+        # Stop when every job is done, or when every browser has died
+        while not join_task.done() and not all(w.done() for w in workers):
+            pending = [t for t in [join_task, *workers] if not t.done()]
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        await browser.close()
-        await p.stop()
+        join_task.cancel()
+        for task in [*workers, *run.retry_tasks]:
+            task.cancel()
+        results = await asyncio.gather(*workers, return_exceptions=True)
+        # Rows already scraped are flushed and fsynced, and the metrics written, even on Ctrl-C
+        await run.writer.close()
+        METRICS.export()
+    for worker_id, result in enumerate(results):
+        if isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError):
+            print(f"[worker {worker_id}] stopped with error: {result}")
+    report_throughput(run.stats, time.monotonic() - started)
+    print(f"Concurrency limit ended at {int(run.limiter.limit)}/{run.limiter.maximum} "
+          f"({run.limiter.congestions} timeouts or blocks); "
+          f"{len(run.failed)} searches failed after {MAX_ATTEMPTS} attempts")
+    if run.blocker:
+        run.blocker.report()
+    if run.cache is not None:
+        run.cache.report()
+    return run.stats
 
-async def main():
+def report_throughput(stats, elapsed):
+    total_pages = sum(s["pages"] for s in stats.values())
+    total_found = sum(s["found"] for s in stats.values())
+    hours = elapsed / 3600 if elapsed > 0 else 0
+    print(f"Total: {total_pages} pages, {total_found} results in {elapsed:.1f}s"
+          f" ({total_pages / hours if hours else 0:.1f} pages/hour)")
+    for worker_id in sorted(stats):
+        s = stats[worker_id]
+        worker_hours = s["elapsed"] / 3600
+        rate = s["pages"] / worker_hours if worker_hours else 0
+        print(f"  worker {worker_id}: {s['pages']} pages, {s['found']} results ({rate:.1f} pages/hour), "
+              f"{s.get('timeout', 0)} timeouts, {s.get('blocked', 0)} blocked, {s.get('error', 0)} errors")
+
+async def process_month(month_dates, month_name, csv_file):
+    # Single-browser run over one month, kept for ad-hoc use
+    print(f"Processing {month_name}")
+    return await run_jobs(build_jobs(month_dates), csv_file, num_workers=1)
+
+def season_jobs() -> List[Tuple[str, str, str]]:
     # Date range: June 1st to August 31st (every day)
     today = datetime.now()
     start_year = today.year
     end_year = today.year
-    # Generate daily dates for each month
-    june_dates = generate_daily_dates(start_year, 6, start_year, 6)
-    july_dates = generate_daily_dates(start_year, 7, start_year, 7)
-    august_dates = generate_daily_dates(start_year, 8, start_year, 8)
-    month_date_lists = [june_dates, july_dates, august_dates]
+    dates = generate_daily_dates(start_year, 6, end_year, 8)
+    return build_jobs(dates)
+
+async def main(num_workers=NUM_WORKERS, tabs=TABS_PER_BROWSER, jobs=None):
+    # jobs defaults to the whole season; shard.py passes one shard's share
+    if jobs is None:
+        jobs = season_jobs()
 
     csv_file = "best_flight_prices.csv"
-    write_header = [not os.path.exists(csv_file) or os.stat(csv_file).st_size == 0]  # mutable for all tasks
 
-    await asyncio.gather(
-        process_month(june_dates, "June", csv_file, write_header),
-        process_month(july_dates, "July", csv_file, write_header),
-        process_month(august_dates, "August", csv_file, write_header),
-    )
+    # Resume: skip every search an earlier (possibly crashed) run already finished
+    journal = Journal(JOURNAL_FILE)
+    pending = journal.pending(jobs)
+    if len(pending) < len(jobs):
+        print(f"Resuming: {len(jobs) - len(pending)} searches already done according to {JOURNAL_FILE}")
+
+    print(f"Queued {len(pending)} searches for {num_workers} browsers x {tabs} tabs")
+    cache = ResultCache()
+    try:
+        await run_jobs(pending, csv_file, num_workers, tabs, journal=journal, cache=cache)
+    finally:
+        cache.close()
     print(f"Done. Results saved to {csv_file}")
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import csv
+import glob
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from result_store import COLUMN_MAP, DB_COLUMNS, DB_FILE, ResultStore
+from result_writer import CSV_COLUMNS
+from scraper import NUM_WORKERS, TABS_PER_BROWSER, main as scraper_main, season_jobs
+
+# Sharded scraping: the season's (from, to, date) searches are split into K
+# shards by a stable hash of the key, and each shard runs as its own process in
+# its own directory (shards/shard-III-of-KKK/) with its own CSV, journal, store,
+# cache and metrics, so K processes use K cores. The shards can also run on
+# different machines: run `shard.py run K I` on each, copy their directories
+# into shards/ on one machine and run `shard.py merge`. The merge is
+# deterministic: shards of one run never share a key, and the output is sorted
+# by key. Keep K the same between runs so each shard resumes from its own journal.
+# `local` splits one browser budget across its shards rather than giving each
+# shard the full NUM_WORKERS x TABS_PER_BROWSER (and its own limiter to fill it).
+CSV_FILE = "best_flight_prices.csv"
+SHARD_ROOT = "shards"
+LOCAL_SHARDS = int(os.environ.get("SCRAPER_SHARDS", str(NUM_WORKERS)))
+
+
+def shard_of(job: Tuple[str, str, str], shards: int) -> int:
+    # Python's hash() is salted per process, so it cannot be shared between hosts
+    digest = hashlib.sha1("|".join(job).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_jobs(jobs, shards: int, index: int) -> List[Tuple[str, str, str]]:
+    return [job for job in jobs if shard_of(job, shards) == index]
+
+
+def shard_dir(shards: int, index: int, root: str = SHARD_ROOT) -> str:
+    return os.path.join(root, f"shard-{index:03d}-of-{shards:03d}")
+
+
+def shard_count(path: str) -> Optional[int]:
+    # K from a shard-III-of-KKK directory name, None for a directory named otherwise
+    match = re.search(r"-of-(\d+)$", os.path.basename(os.path.normpath(path)))
+    return int(match.group(1)) if match else None
+
+
+def split_workers(total: int, shards: int) -> List[int]:
+    # total browsers spread as evenly as possible, but every shard needs at least one
+    return [max(1, total // shards + (index < total % shards)) for index in range(shards)]
+
+
+def run_shard(shards: int, index: int, num_workers: int = NUM_WORKERS, tabs: int = TABS_PER_BROWSER,
+              root: str = SHARD_ROOT):
+    # scraper.main with this shard's jobs, inside the shard directory so every
+    # file it writes (CSV, journal, store, cache, metrics) belongs to the shard
+    jobs = shard_jobs(season_jobs(), shards, index)
+    path = shard_dir(shards, index, root)
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    print(f"Shard {index + 1}/{shards}: {len(jobs)} searches in {path}")
+    asyncio.run(scraper_main(num_workers, tabs, jobs=jobs))
+
+
+def run_local(shards: int, num_workers: int, tabs: int, root: str = SHARD_ROOT) -> int:
+    # Every shard as a child process of this one, then the merge; each child's output goes to run.log in its directory.
+    # num_workers is the browser count for the whole run, shared out between the shards
+    started = time.monotonic()
+    workers = split_workers(num_workers, shards)
+    children = []
+    for index in range(shards):
+        path = shard_dir(shards, index, root)
+        os.makedirs(path, exist_ok=True)
+        log = open(os.path.join(path, "run.log"), "a", encoding="utf-8")
+        command = [sys.executable, os.path.abspath(__file__), "run", str(shards), str(index),
+                   "--workers", str(workers[index]), "--tabs", str(tabs), "--root", os.path.abspath(root)]
+        children.append((index, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT), log))
+    if sum(workers) > num_workers:
+        print(f"{shards} shards need at least {shards} browsers; running {sum(workers)} instead of {num_workers}")
+    print(f"Started {shards} shards ({sum(workers)} browsers x {tabs} tabs in total); logs in {root}/*/run.log")
+    failed = 0
+    for index, child, log in children:
+        code = child.wait()
+        log.close()
+        if code:
+            failed += 1
+            print(f"Shard {index + 1}/{shards} exited with code {code}")
+    print(f"All shards finished in {time.monotonic() - started:.1f}s ({failed} failed)")
+    merge_shards(sorted(glob.glob(os.path.join(root, f"shard-*-of-{shards:03d}"))))
+    return 1 if failed else 0
+
+
+def _key(row: Dict) -> Tuple[str, str, str]:
+    return row["From"], row["To"], row["Date"]
+
+
+def _read_rows(source: str) -> Tuple[List[Dict], Optional[List[str]]]:
+    # (rows, columns) of a CSV
+    if not os.path.exists(source):
+        print(f"{source} not found, skipping")
+        return [], None
+    with open(source, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        # Skips the torn last line of a shard that was killed
+        rows = [row for row in reader if row.get("From") and row.get("To") and row.get("Date")]
+    print(f"Read {len(rows)} rows from {source}")
+    return rows, reader.fieldnames
+
+
+def _scrape_times(shard_dir: str) -> Dict[Tuple[str, str, str], str]:
+    # (from, to, date) -> scraped_at in the shard's store
+    store = ResultStore(os.path.join(shard_dir, DB_FILE))
+    times = {(f, t, d): scraped_at or "" for f, t, d, _, scraped_at in store.scrape_times()}
+    store.close()
+    return times
+
+
+def merge_shards(shard_dirs: List[str], output: str = CSV_FILE, db_file: str = DB_FILE) -> int:
+    # One row per key, sorted by key, written atomically to output. Rows already in
+    # output keep the first row per key (what clean_data uses); shard rows are newer
+    # and replace them, and within a shard the last (newest) row of a key wins. A key
+    # found in several shard directories (K changed between runs) is taken from the
+    # one whose store scraped it last, so shards of different K can only be merged
+    # when every one of them has its store.
+    shard_dirs = sorted(shard_dirs)
+    counts = {shard_count(d) for d in shard_dirs}
+    without_store = [d for d in shard_dirs if not os.path.exists(os.path.join(d, DB_FILE))]
+    if len(counts) > 1 and without_store:
+        raise ValueError(f"Shards of different K ({', '.join(sorted(map(str, counts)))}) can only be merged by scrape "
+                         f"time, but these have no {DB_FILE}: {', '.join(without_store)}")
+
+    rows: Dict[Tuple[str, str, str], Dict] = {}
+    scraped: Dict[Tuple[str, str, str], str] = {}  # scrape time of the shard row kept for a key
+    columns = None
+    if os.path.exists(output):
+        existing, columns = _read_rows(output)
+        for row in existing:
+            rows.setdefault(_key(row), row)
+    for shard in shard_dirs:
+        shard_rows, fieldnames = _read_rows(os.path.join(shard, CSV_FILE))
+        columns = columns or fieldnames
+        times = _scrape_times(shard) if len(counts) > 1 else {}
+        for row in shard_rows:
+            key = _key(row)
+            scraped_at = times.get(key, "")
+            if key not in scraped or scraped_at >= scraped[key]:
+                rows[key] = row
+                scraped[key] = scraped_at
+
+    tmp_file = output + ".tmp"
+    with open(tmp_file, "w", newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns or CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for key in sorted(rows):
+            writer.writerow(rows[key])
+    os.replace(tmp_file, output)
+    print(f"Merged {len(rows)} rows into {output}")
+
+    if db_file:
+        merge_stores([os.path.join(d, DB_FILE) for d in shard_dirs], db_file)
+    return len(rows)
+
+
+def merge_stores(shard_db_files: List[str], db_file: str = DB_FILE):
+    # Copies the newest row of every key in the shard stores, with its scrape time,
+    # into the main store so refresh.py sees the shard runs. Keys the main store
+    # already has at that scrape time or later are left alone, so merging twice
+    # adds nothing to the price history.
+    newest: Dict[Tuple[str, str, str], Dict] = {}
+    for path in shard_db_files:
+        if not os.path.exists(path):
+            continue
+        shard_store = ResultStore(path)
+        for values in shard_store.conn.execute(f"SELECT {', '.join(DB_COLUMNS)}, scraped_at FROM flights"):
+            row = {name: value for (name, _), value in zip(COLUMN_MAP, values)}
+            row["Scraped At"] = values[-1]
+            key = _key(row)
+            if key not in newest or (row["Scraped At"] or "") >= (newest[key]["Scraped At"] or ""):
+                newest[key] = row
+        shard_store.close()
+    store = ResultStore(db_file)
+    current = {(f, t, d): scraped_at or "" for f, t, d, _, scraped_at in store.scrape_times()}
+    rows = [row for key, row in newest.items() if key not in current or (row["Scraped At"] or "") > current[key]]
+    store.upsert_many(rows)
+    print(f"Copied {len(rows)} newer rows; {db_file} now holds {len(store)} rows")
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the season in K shards, in parallel processes or on several hosts")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    local = commands.add_parser("local", help="run every shard as a process on this machine, then merge")
+    local.add_argument("shards", type=int, nargs="?", default=LOCAL_SHARDS,
+                       help=f"number of shards (SCRAPER_SHARDS, {LOCAL_SHARDS} by default)")
+
+    run = commands.add_parser("run", help="run one shard in this process (one per host for multi-host runs)")
+    run.add_argument("shards", type=int)
+    run.add_argument("index", type=int, help="0 .. shards-1")
+
+    local.add_argument("--workers", type=int, default=NUM_WORKERS, help="browsers in total, split between the shards")
+    run.add_argument("--workers", type=int, default=NUM_WORKERS, help="browsers for this shard")
+    for command in (local, run):
+        command.add_argument("--tabs", type=int, default=TABS_PER_BROWSER, help="tabs per browser")
+
+    merge = commands.add_parser("merge", help=f"merge shard outputs into {CSV_FILE}")
+    merge.add_argument("dirs", nargs="*", help=f"shard directories (default: every one under {SHARD_ROOT}/)")
+    merge.add_argument("--no-db", action="store_true", help=f"do not copy the shard stores into {DB_FILE}")
+
+    for command in (local, run, merge):
+        command.add_argument("--root", default=SHARD_ROOT, help="directory holding the shard directories")
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        dirs = args.dirs or sorted(glob.glob(os.path.join(args.root, "shard-*")))
+        if not dirs:
+            print(f"No shard directories under {args.root}/")
+            return 1
+        try:
+            merge_shards(dirs, db_file=None if args.no_db else DB_FILE)
+        except ValueError as e:
+            print(e)
+            return 1
+        return 0
+    if args.shards < 1 or (args.command == "run" and not 0 <= args.index < args.shards):
+        parser.error("need shards >= 1 and 0 <= index < shards")
+    if args.command == "run":
+        run_shard(args.shards, args.index, args.workers, args.tabs, args.root)
+        return 0
+    return run_local(args.shards, args.workers, args.tabs, args.root)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
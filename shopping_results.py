@@ -0,0 +1,79 @@
+import json
+from datetime import datetime
+from typing import Dict, List
+
+# Parser for the GetShoppingResults payload that SCRAPER_EXTRACT=network reads.
+# EXPERIMENTAL: the field positions below were worked out by hand and have only
+# been checked against the hand-built fixture in tests/fixtures, not against a
+# recorded live response. Record real payloads with SCRAPER_RECORD_DIR and add
+# them as fixtures before relying on this mode.
+CURRENCY_PREFIX = "NT$"
+
+def _dig(data, *path):
+    # data[path[0]][path[1]]... or None when the payload does not have that shape
+    for index in path:
+        try:
+            data = data[index]
+        except (IndexError, KeyError, TypeError):
+            return None
+    return data
+
+def _format_duration(minutes) -> str:
+    if not isinstance(minutes, int):
+        return "N/A"
+    hours, mins = divmod(minutes, 60)
+    if hours and mins:
+        return f"{hours} hr {mins} min"
+    return f"{hours} hr" if hours else f"{mins} min"
+
+def _format_stops(stops: int) -> str:
+    if stops == 0:
+        return "Nonstop"
+    return "1 stop" if stops == 1 else f"{stops} stops"
+
+def _format_time(time_parts, day_offset: int = 0) -> str:
+    # [22, 50] -> "10:50 PM", with "+1" when arriving the next day
+    if not time_parts:
+        return "N/A"
+    hour = time_parts[0] or 0
+    minute = time_parts[1] if len(time_parts) > 1 and time_parts[1] else 0
+    text = f"{(hour % 12) or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+    return text + (f"+{day_offset}" if day_offset > 0 else "")
+
+def parse_flight_entry(entry) -> Dict:
+    # Field positions follow the GetShoppingResults payload layout
+    legs = _dig(entry, 0, 2) or []
+    price = _dig(entry, 1, 0, -1)
+    co2_grams = _dig(entry, 0, 22, 7)
+    day_offset = 0
+    first_date, last_date = _dig(legs, 0, 20), _dig(legs, -1, 21)
+    if first_date and last_date:
+        try:
+            day_offset = (datetime(*last_date) - datetime(*first_date)).days
+        except (TypeError, ValueError):
+            day_offset = 0
+    airlines = _dig(entry, 0, 1)
+    return {
+        "Departure Time": _format_time(_dig(legs, 0, 8)),
+        "Arrival Time": _format_time(_dig(legs, -1, 10), day_offset),
+        "Airline Company": ", ".join(airlines) if isinstance(airlines, list) and airlines else "N/A",
+        "Flight Duration": _format_duration(_dig(entry, 0, 9)),
+        "Stops": _format_stops(len(legs) - 1) if legs else "N/A",
+        "Price": f"{CURRENCY_PREFIX}{price:,}" if isinstance(price, (int, float)) else "N/A",
+        "co2 emissions": f"{round(co2_grams / 1000)} kg CO2e" if isinstance(co2_grams, (int, float)) else "N/A",
+        "emissions variation": "N/A",
+    }
+
+def parse_shopping_results(body: str) -> List[Dict]:
+    # Body is ")]}'" followed by [["wrb.fr", null, "<json>", ...]]
+    try:
+        outer = json.loads(body.lstrip(")]}'\n"))
+        inner = json.loads(_dig(outer, 0, 2) or "null")
+    except (ValueError, TypeError):
+        return []
+    flights = []
+    for section in (2, 3):  # best flights, other flights
+        entries = _dig(inner, section, 0)
+        if isinstance(entries, list):
+            flights.extend(parse_flight_entry(entry) for entry in entries)
+    return [f for f in flights if f["Price"] != "N/A"]
@@ -0,0 +1,70 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from data_clean import (
+    convert_co2,
+    convert_duration_to_minutes,
+    convert_price,
+    convert_stops,
+    parse_co2_series,
+    parse_duration_series,
+    parse_price_series,
+    parse_stops_series,
+)
+
+# column -> (row-wise converter, vectorized parser)
+PARSERS = {
+    "Stops": (convert_stops, parse_stops_series),
+    "Flight Duration": (convert_duration_to_minutes, parse_duration_series),
+    "Price": (convert_price, parse_price_series),
+    "co2 emissions": (convert_co2, parse_co2_series),
+}
+
+# Odd inputs seen in (or plausible for) the raw CSV
+EDGE_CASES = {
+    "Stops": ["Nonstop", " NONSTOP ", "1 stop", "2 stops", "", "   ", "stops", np.nan, 3, 2.7, "10 stops"],
+    "Flight Duration": ["3 hr 50 min", "13 hr", "45 min", "hr 5 min", "min", "", " ", "abc",
+                        "1 hr 2 hr 3 min", "3hrs 5min", np.nan, 120, 95.5],
+    "Price": ["NT$3,670", "NT$12,005", "$", "", "1.2.3", "3.", "N/A", np.nan, 4200, 3999.0],
+    "co2 emissions": ["140 kg CO2e", "1,204 kg CO2e", "kg", "", "12.5 kg", np.nan, 210, 180.9],
+}
+
+
+def run_quiet(func, series):
+    # Result (or the exception type raised) and everything printed
+    out = io.StringIO()
+    with redirect_stdout(out):
+        try:
+            result = func(series).reset_index(drop=True)
+        except Exception as e:
+            result = type(e)
+    return result, out.getvalue()
+
+
+class VectorizedParsersTest(unittest.TestCase):
+    # The parse_*_series functions must give the same values and print the same
+    # messages as the convert_* functions they replaced, edge cases included
+    def assert_same(self, name, series):
+        convert, parse = PARSERS[name]
+        expected, expected_log = run_quiet(lambda s: s.apply(convert).astype("Int64"), series)
+        actual, actual_log = run_quiet(parse, series)
+        if isinstance(expected, type) or isinstance(actual, type):
+            self.assertIs(actual, expected)  # both raise the same error (e.g. a fractional value)
+        else:
+            pd.testing.assert_series_equal(actual, expected)
+        self.assertEqual(actual_log, expected_log)
+
+    def test_edge_cases(self):
+        for name, values in EDGE_CASES.items():
+            with self.subTest(column=name, values="mixed"):
+                self.assert_same(name, pd.Series(values, dtype=object))
+            with self.subTest(column=name, values="numeric"):
+                self.assert_same(name, pd.Series([v for v in values if not isinstance(v, str)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import unittest
+
+from shopping_results import parse_shopping_results
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class ParseShoppingResultsTest(unittest.TestCase):
+    # shopping_results_minimal.txt is hand-built in the layout parse_flight_entry
+    # assumes (best flights in section 2, other flights in section 3); replace it
+    # with a recorded payload (SCRAPER_RECORD_DIR) once one is available
+    def test_minimal_payload(self):
+        self.assertEqual(parse_shopping_results(read_fixture("shopping_results_minimal.txt")), [
+            {
+                "Departure Time": "8:50 AM",
+                "Arrival Time": "1:05 PM",
+                "Airline Company": "EVA Air",
+                "Flight Duration": "3 hr 15 min",
+                "Stops": "Nonstop",
+                "Price": "NT$9,876",
+                "co2 emissions": "251 kg CO2e",
+                "emissions variation": "N/A",
+            },
+            {
+                "Departure Time": "10:50 PM",
+                "Arrival Time": "6:00 AM+1",
+                "Airline Company": "China Airlines, ANA",
+                "Flight Duration": "7 hr 20 min",
+                "Stops": "1 stop",
+                "Price": "NT$7,450",
+                "co2 emissions": "N/A",
+                "emissions variation": "N/A",
+            },
+            {
+                "Departure Time": "12:05 AM",
+                "Arrival Time": "12:30 PM",
+                "Airline Company": "N/A",
+                "Flight Duration": "1 hr",
+                "Stops": "2 stops",
+                "Price": "NT$12,000",
+                "co2 emissions": "1 kg CO2e",
+                "emissions variation": "N/A",
+            },
+            # The Starlux entry has no price and is dropped
+        ])
+
+    def test_unparsable_bodies(self):
+        self.assertEqual(parse_shopping_results(""), [])
+        self.assertEqual(parse_shopping_results(")]}'\nnot json"), [])
+        self.assertEqual(parse_shopping_results(')]}\'\n[["wrb.fr", null, null]]'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,35 +1,50 @@
 import asyncio
-import csv
-import os
-from scraper import get_best_price, FlightURLBuilder, setup_browser
+from scraper import classify_error, search_best_price, FlightURLBuilder, launch_browser
+from request_blocking import ResourceBlocker
+from result_writer import CsvSink, ResultWriter
+from result_store import DB_FILE, ResultStore
+from result_cache import ResultCache
 from check_date import check_missing_dates
+from metrics import METRICS
 
 CSV_FILE = "best_flight_prices.csv"
 
 async def scrape_and_append(missing_entries):
-    p, browser, page = await setup_browser()
-    keys = None
+    blocker = ResourceBlocker()
+    p, browser, page = await launch_browser(blocker)
+    writer = ResultWriter([CsvSink(CSV_FILE), ResultStore(DB_FILE)]).start()
+    cache = ResultCache()
     try:
-        with open(CSV_FILE, "a", newline='', encoding='utf-8') as f:
-            writer = None
-            for from_airport, to_airport, date in missing_entries:
-                url = FlightURLBuilder.build_url(from_airport, to_airport, date)
-                best = await get_best_price(page, url)
+        for from_airport, to_airport, date in missing_entries:
+            url = FlightURLBuilder.build_url(from_airport, to_airport, date)
+            # get_best_price behind the URL cache, keeping timeouts and blocks apart for the metrics
+            best = cache.get(url)
+            if best is not None:
+                outcome = "cached"
+            else:
+                try:
+                    best = await search_best_price(page, url)
+                    outcome = "success" if best else "empty"
+                except Exception as e:
+                    print(f"Error scraping {url}: {e}")
+                    best, outcome = None, classify_error(e)
                 if best:
-                    best["From"] = from_airport
-                    best["To"] = to_airport
-                    best["Date"] = date
-                    if keys is None:
-                        keys = ["From", "To", "Date"] + [k for k in best if k not in ("From", "To", "Date")]
-                        writer = csv.DictWriter(f, fieldnames=keys)
-                        if os.stat(CSV_FILE).st_size == 0:
-                            writer.writeheader()
-                    if writer:
-                        writer.writerow(best)
-                    print(f"Appended data: {from_airport} -> {to_airport} on {date}")
-                else:
-                    print(f"No data found for {from_airport} -> {to_airport} on {date}")
+                    cache.put(url, best)
+            METRICS.search(from_airport, to_airport, "update", outcome)
+            if best:
+                best["From"] = from_airport
+                best["To"] = to_airport
+                best["Date"] = date
+                writer.put(best)
+                print(f"Appended data: {from_airport} -> {to_airport} on {date}")
+            else:
+                print(f"No data found for {from_airport} -> {to_airport} on {date}")
     finally:
+        await writer.close()
+        blocker.report()
+        cache.report()
+        METRICS.export()
+        cache.close()
         await browser.close()
         await p.stop()
 
@@ -40,6 +55,7 @@ async def main():
     end_year = 2025
     end_month = 8
 
+    # Gap detection from the coverage bitmap, which only reads rows appended since the last check
     missing_entries = check_missing_dates(CSV_FILE, start_year, start_month, end_year, end_month)
     if not missing_entries:
         print("No missing dates to update.")